@@ -5,9 +5,13 @@ import json
 from pathlib import Path
 
 _FMT = '=IB3x8s'
+_FD_FMT = '=IBB2x64s'  # can_id, len, flags, 64 data bytes
+_FD_LENS = (0, 1, 2, 3, 4, 5, 6, 7, 8, 12, 16, 20, 24, 32, 48, 64)
 
-def can_socket(iface: str = 'can0') -> socket.socket:
+def can_socket(iface: str = 'can0', fd: bool = False) -> socket.socket:
     s = socket.socket(socket.PF_CAN, socket.SOCK_RAW, socket.CAN_RAW)
+    if fd:
+        s.setsockopt(socket.SOL_CAN_RAW, socket.CAN_RAW_FD_FRAMES, 1)
     s.bind((iface,))
     return s
 
@@ -18,8 +22,20 @@ def send_frame(sock: socket.socket, can_id: int, data: bytes) -> None:
     frame = struct.pack(_FMT, can_id, dlc, data + bytes(8 - dlc))
     sock.send(frame)
 
+def send_fd_frame(sock: socket.socket, can_id: int, data: bytes) -> None:
+    """Send a CAN FD frame (socket opened with fd=True); pads to a valid FD length."""
+    n = next((ln for ln in _FD_LENS if ln >= len(data)), None)
+    if n is None:
+        raise ValueError('CAN FD payload > 64 bytes')
+    frame = struct.pack(_FD_FMT, can_id, n, 0, data + bytes(64 - len(data)))
+    sock.send(frame)
+
 def recv_frame(sock: socket.socket) -> tuple[int, int, bytes]:
-    pkt = sock.recv(16)
+    """Receive one frame; FD frames (only on fd=True sockets) return up to 64 payload bytes."""
+    pkt = sock.recv(72)
+    if len(pkt) == 72:
+        can_id, dlc, _, payload = struct.unpack(_FD_FMT, pkt)
+        return can_id, dlc, payload[:dlc]
     can_id, dlc, payload = struct.unpack(_FMT, pkt)
     return can_id, dlc, payload
 
@@ -69,6 +85,27 @@ def get_variable_by_name(sock: socket.socket, var_name: str, dest: int = 0, src:
 
 # ----- Functions (0x740/0x760 + ecu) -----
 
+# epic_can_bus root: .../epic_can_bus/examples/python/EpicECU/__init__.py -> parents[3]
+_ROOT = Path(__file__).resolve().parents[3]
+
+_catalog_cache = {}
+
+def _load_catalog(filename: str) -> list:
+    """Load a generated JSON catalog from the epic_can_bus root once per process."""
+    data = _catalog_cache.get(filename)
+    if data is None:
+        cfg = _ROOT / filename
+        data = json.loads(cfg.read_text(encoding='utf-8')) if cfg.exists() else []
+        _catalog_cache[filename] = data
+    return data
+
+def load_functions() -> list:
+    return _load_catalog('functions_v1.json')
+
+def load_variables() -> list:
+    # gen_variables.py writes the same list minified alongside; it parses faster
+    return _load_catalog('variables.min.json') or _load_catalog('variables.json')
+
 def _resolve_function_id(token: int | str) -> int:
     if isinstance(token, int):
         return token
@@ -76,11 +113,7 @@ def _resolve_function_id(token: int | str) -> int:
         return int(token, 0)
     except Exception:
         pass
-    # epic_can_bus root: .../epic_can_bus/examples/python/EpicECU/__init__.py -> parents[3]
-    base = Path(__file__).resolve().parents[3]
-    cfg = base / 'functions_v1.json'
-    data = json.loads(cfg.read_text(encoding='utf-8')) if cfg.exists() else []
-    for item in data:
+    for item in load_functions():
         if item.get('luaName') == token:
             return int(item.get('id'))
     raise ValueError(f'Function not found: {token}')
@@ -125,3 +158,7 @@ def set_variable_by_name(sock: socket.socket, name: str, value: float, ecu_addr:
     h = djb2lowercase(name)
     set_variable(sock, h, value, ecu_addr)
 
+
+# ----- Pipelined reads with adaptive pacing -----
+
+from .pacing import EcuPacer, Pacing, default_pacing, get_variables  # noqa: E402
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""Limit checks over live EPIC values, indexed by the variables they read.
+
+A rule trips when its `when` expression holds and clears when its `clear`
+expression holds (default: when `when` no longer holds), so hysteresis is a
+second threshold:
+
+    {"name": "coolant_hot", "when": "coolant > 105", "clear": "coolant < 100", "delay": 2}
+    {"name": "oil_low", "when": "oilPressure < 1.5 and rpm > 3000", "delay": 0.5,
+     "call": ["setCheckEngine", 1]}
+    {"name": "vbatt_low", "var": "vbatt", "below": 11.5, "hysteresis": 0.3}
+
+Expressions use the derived-channel syntax (see derived.py) without the
+stateful avg()/ema(): define those as derived channels and reference them
+by name. `delay` / `clear_delay` debounce the transitions: the condition
+must hold for that long before the rule changes state.
+
+Each rule is listed under every variable it reads, so a sample only
+evaluates the rules that depend on it; pending debounce timers sit in a
+heap. Per-sample cost depends on the rules touching that variable, not on
+the total rule count.
+"""
+import heapq
+import json
+import struct
+from collections import namedtuple
+from pathlib import Path
+
+from . import _FMT, _resolve_function_id, djb2lowercase
+from .derived import _compile
+
+OK = 'ok'
+PENDING = 'pending'    # `when` holds, waiting out `delay`
+ACTIVE = 'active'
+CLEARING = 'clearing'  # `clear` holds, waiting out `clear_delay`
+
+# kind: 'trip' | 'clear'; errors: messages from actions that failed (e.g. a full CAN tx queue)
+Event = namedtuple('Event', 'ts rule kind inputs errors')
+
+
+def _compile_condition(name: str, expr: str):
+    fn, inputs, factories = _compile(name, expr)
+    if factories:
+        # a rule evaluates whenever any of its inputs arrives (and `when` pauses while
+        # the rule is active), so per-call-site state would not see one sample per input
+        raise ValueError(f'{name}: avg()/ema() are not allowed in rules; use a derived channel')
+    return fn, inputs
+
+
+class Rule:
+    def __init__(self, name: str, when: str, clear: str | None = None, delay_s: float = 0.0,
+                 clear_delay_s: float = 0.0, on_trip=None, on_clear=None):
+        self.name = name
+        self.when_expr = when
+        self.clear_expr = clear
+        self.when, when_inputs = _compile_condition(name, when)
+        inputs = list(when_inputs)
+        self.clear = None
+        if clear is not None:
+            self.clear, clear_inputs = _compile_condition(name, clear)
+            inputs += [n for n in clear_inputs if n not in inputs]
+        self.inputs = inputs
+        self.delay_s = delay_s
+        self.clear_delay_s = clear_delay_s
+        self.on_trip = list(on_trip or [])
+        self.on_clear = list(on_clear or [])
+        self.state = OK
+        self.gen = 0       # bumped to invalidate a scheduled timer
+        self.trips = 0
+        self.since = None  # ts of the last state change
+
+    @property
+    def active(self) -> bool:
+        return self.state in (ACTIVE, CLEARING)
+
+
+def threshold(var: str, above: float | None = None, below: float | None = None,
+              hysteresis: float = 0.0) -> tuple:
+    """(when, clear) expressions for a single-variable limit with hysteresis."""
+    if (above is None) == (below is None):
+        raise ValueError('threshold needs exactly one of above / below')
+    if above is not None:
+        return f'{var} > {float(above)!r}', f'{var} <= {float(above) - hysteresis!r}'
+    return f'{var} < {float(below)!r}', f'{var} >= {float(below) + hysteresis!r}'
+
+
+def call_action(sock, func: int | str, arg: float = 0.0, dest: int = 0):
+    """Action sending a call_function request, fire-and-forget.
+
+    The frame is built once; the 0x760 reply is left for whoever reads the
+    socket next (get_variables and the pollers skip foreign frames). A send
+    that fails (full tx queue on a non-blocking socket) is recorded in
+    event.errors instead of raising out of feed().
+    """
+    frame = bytearray(struct.pack(_FMT, 0x740 + (dest & 0x0F), 6, bytes(8)))
+    struct.pack_into('>Hf', frame, 8, _resolve_function_id(func) & 0xFFFF, float(arg))
+    frame = bytes(frame)
+
+    def action(event):
+        try:
+            sock.send(frame)
+        except OSError as e:
+            event.errors.append(f'call_function {func}: {e}')
+    return action
+
+
+class AlarmEngine:
+    def __init__(self):
+        self.rules = {}    # name -> Rule
+        self.index = {}    # variable name -> [Rule]
+        self.names = {}    # hash -> variable name
+        self.values = {}   # variable name -> latest value
+        self.timers = []   # heap of (deadline, seq, gen, Rule)
+        self._seq = 0
+        self.on_event = []  # callbacks for every trip / clear
+
+    def add(self, rule: Rule) -> Rule:
+        if rule.name in self.rules:
+            raise ValueError(f'duplicate rule name: {rule.name}')
+        self.rules[rule.name] = rule
+        for n in rule.inputs:
+            self.index.setdefault(n, []).append(rule)
+            self.names[djb2lowercase(n)] = n
+        return rule
+
+    def add_dict(self, d: dict, sock=None, dest: int = 0) -> Rule:
+        """Add a rule from its JSON form (see module docstring).
+
+        "call": [func, arg] needs sock; the call is sent when the rule trips.
+        """
+        try:
+            name = d['name']
+            if 'var' in d:
+                when, clear = threshold(d['var'], d.get('above'), d.get('below'), float(d.get('hysteresis', 0.0)))
+            else:
+                when, clear = d['when'], d.get('clear')
+        except KeyError as e:
+            raise ValueError(f'rule {d.get("name", "?")}: missing {e}') from None
+        on_trip = []
+        if 'call' in d:
+            if sock is None:
+                raise ValueError(f'rule {name}: "call" needs a CAN socket')
+            func, *arg = d['call']
+            on_trip.append(call_action(sock, func, float(arg[0]) if arg else 0.0, dest))
+        return self.add(Rule(name, when, clear, float(d.get('delay', 0.0)), float(d.get('clear_delay', 0.0)),
+                             on_trip=on_trip))
+
+    def load(self, path, sock=None, dest: int = 0) -> None:
+        for d in json.loads(Path(path).read_text(encoding='utf-8')):
+            self.add_dict(d, sock, dest)
+
+    @property
+    def inputs(self) -> set:
+        return set(self.index)
+
+    def active(self) -> list:
+        return [r for r in self.rules.values() if r.active]
+
+    # ----- evaluation -----
+
+    def feed(self, name: str, value: float, ts: float) -> list:
+        """Record one sample and evaluate the rules that read it; returns [Event]."""
+        events = []
+        if self.timers and self.timers[0][0] <= ts:
+            self._fire(ts, events)
+        if value is None:
+            return events
+        values = self.values
+        values[name] = value
+        for rule in self.index.get(name, ()):
+            self._eval(rule, values, ts, events)
+        return events
+
+    def feed_hash(self, h: int, value: float, ts: float) -> list:
+        name = self.names.get(h)
+        if name is None:
+            return self.tick(ts)
+        return self.feed(name, value, ts)
+
+    def tick(self, ts: float) -> list:
+        """Expire debounce timers without a new sample."""
+        events = []
+        if self.timers and self.timers[0][0] <= ts:
+            self._fire(ts, events)
+        return events
+
+    def _eval(self, rule: Rule, values: dict, ts: float, events: list) -> None:
+        try:
+            if rule.state in (OK, PENDING):
+                hit = rule.when(values, ())
+                if hit and rule.state == OK:
+                    if rule.delay_s > 0:
+                        self._arm(rule, PENDING, ts + rule.delay_s)
+                    else:
+                        self._trip(rule, ts, events)
+                elif not hit and rule.state == PENDING:
+                    self._disarm(rule, OK)
+            else:
+                if rule.clear is None:
+                    cleared = not rule.when(values, ())
+                else:
+                    cleared = rule.clear(values, ())
+                if cleared and rule.state == ACTIVE:
+                    if rule.clear_delay_s > 0:
+                        self._arm(rule, CLEARING, ts + rule.clear_delay_s)
+                    else:
+                        self._clear(rule, ts, events)
+                elif not cleared and rule.state == CLEARING:
+                    self._disarm(rule, ACTIVE)
+        except KeyError:
+            pass  # another input of this rule has not been seen yet
+        except (ZeroDivisionError, ValueError, OverflowError, TypeError):
+            pass  # undefined this sample; keep the current state
+
+    def _arm(self, rule: Rule, state: str, deadline: float) -> None:
+        rule.state = state
+        rule.gen += 1
+        self._seq += 1
+        heapq.heappush(self.timers, (deadline, self._seq, rule.gen, rule))
+
+    def _disarm(self, rule: Rule, state: str) -> None:
+        rule.state = state
+        rule.gen += 1  # the heap entry goes stale and is dropped when it comes due
+
+    def _fire(self, ts: float, events: list) -> None:
+        timers = self.timers
+        while timers and timers[0][0] <= ts:
+            deadline, _, gen, rule = heapq.heappop(timers)
+            if gen != rule.gen:
+                continue
+            if rule.state == PENDING:
+                self._trip(rule, deadline, events)
+            elif rule.state == CLEARING:
+                self._clear(rule, deadline, events)
+
+    def _emit(self, rule: Rule, kind: str, ts: float, actions, events: list) -> None:
+        ev = Event(ts, rule.name, kind, {n: self.values.get(n) for n in rule.inputs}, [])
+        events.append(ev)
+        for fn in actions:
+            fn(ev)
+        for fn in self.on_event:
+            fn(ev)
+
+    def _trip(self, rule: Rule, ts: float, events: list) -> None:
+        rule.state = ACTIVE
+        rule.gen += 1
+        rule.trips += 1
+        rule.since = ts
+        self._emit(rule, 'trip', ts, rule.on_trip, events)
+
+    def _clear(self, rule: Rule, ts: float, events: list) -> None:
+        rule.state = OK
+        rule.gen += 1
+        rule.since = ts
+        self._emit(rule, 'clear', ts, rule.on_clear, events)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Snapshot and restore an ECU's config (calibration) variables.
+
+dump():    pipelined read of every source == 'config' entry in variables.json
+save():    minified JSON ({"format": "epic-cal/1", "ecu": n, "values": {name: value}}),
+           gzip-compressed when the path ends in .gz
+restore(): read the live values, write only the ones that differ (compared
+           at float32 precision, which is what travels on the wire) at a
+           bounded frame rate, then read them back and re-send mismatches
+"""
+import gzip
+import json
+import time
+import struct
+import socket
+from pathlib import Path
+
+from . import load_variables, set_variable, get_variables
+
+FORMAT = 'epic-cal/1'
+
+
+def config_variables() -> dict:
+    """{name: hash} for every writable variable in the catalog."""
+    return {it['name']: int(it['hash']) for it in load_variables() if it.get('source') == 'config'}
+
+
+def same_f32(a: float, b: float) -> bool:
+    return struct.pack('>f', a) == struct.pack('>f', b)
+
+
+def dump(sock: socket.socket, dest: int = 0, names=None) -> tuple[dict, list]:
+    """Read config variables; returns ({name: value}, [names that never answered])."""
+    catalog = config_variables()
+    if names is not None:
+        catalog = {n: catalog[n] for n in names if n in catalog}
+    live = get_variables(sock, catalog.values(), dest=dest)
+    values = {}
+    missing = []
+    for name, h in catalog.items():
+        v = live.get(h)
+        if v is None:
+            missing.append(name)
+        else:
+            values[name] = v
+    return values, missing
+
+
+def _open(path: Path, mode: str):
+    if str(path).endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def save(path: Path, values: dict, ecu: int = 0) -> None:
+    with _open(Path(path), 'w') as f:
+        json.dump({'format': FORMAT, 'ecu': ecu, 'values': values}, f, separators=(',', ':'))
+
+
+def load(path: Path) -> dict:
+    """{name: value} from a saved file; ValueError unless every value fits a float32 frame."""
+    with _open(Path(path), 'r') as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or data.get('format') != FORMAT or not isinstance(data.get('values', {}), dict):
+        raise ValueError(f'{path}: not an {FORMAT} calibration file')
+    values = {}
+    for k, v in data.get('values', {}).items():
+        try:
+            values[str(k)] = v = float(v)
+            struct.pack('>f', v)
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError(f'{path}: {k}: {v!r} is not a float32 value') from None
+    return values
+
+
+def write_values(sock: socket.socket, writes, dest: int = 0, rate_hz: float = 500.0) -> None:
+    """Send (hash, value) pairs as 0x780 frames, at most rate_hz frames per second."""
+    gap = 1.0 / rate_hz if rate_hz > 0 else 0.0
+    next_t = time.perf_counter()
+    for h, v in writes:
+        now = time.perf_counter()
+        if now < next_t:
+            time.sleep(next_t - now)
+        set_variable(sock, h, v, ecu_addr=dest)
+        next_t += gap
+
+
+def restore(sock: socket.socket, wanted: dict, dest: int = 0, rate_hz: float = 500.0,
+            retries: int = 2, dry_run: bool = False) -> dict:
+    """Bring the ECU's config in line with `wanted` ({name: value}).
+
+    Returns a report: changed / unchanged / unknown (not a config variable in
+    this catalog) / unreadable (no answer before writing) / failed (still
+    different after the read-back sweeps).
+    """
+    catalog = config_variables()
+    unknown = sorted(n for n in wanted if n not in catalog)
+    targets = {catalog[n]: (n, v) for n, v in wanted.items() if n in catalog}
+    live = get_variables(sock, targets.keys(), dest=dest)
+    unreadable = sorted(targets[h][0] for h, v in live.items() if v is None)
+    todo = {h: v for h, (_, v) in targets.items() if live[h] is not None and not same_f32(live[h], v)}
+    changed = sorted(targets[h][0] for h in todo)
+    report = {
+        'changed': changed,
+        'unchanged': len(targets) - len(todo) - len(unreadable),
+        'unknown': unknown,
+        'unreadable': unreadable,
+        'failed': [],
+    }
+    if dry_run:
+        return report
+    for _ in range(1 + retries):
+        if not todo:
+            break
+        write_values(sock, todo.items(), dest=dest, rate_hz=rate_hz)
+        check = get_variables(sock, todo.keys(), dest=dest)
+        todo = {h: v for h, v in todo.items() if check[h] is None or not same_f32(check[h], v)}
+    report['failed'] = sorted(targets[h][0] for h in todo)
+    return report
@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""Subcommands for the `epic` entry point (examples/python/epic.py).
+
+Each cmd_* takes (iface, argv) and returns a process exit code. Modules are
+imported by epic.py only when their subcommand runs.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import struct
+
+from . import (can_socket, call_function, set_variable, djb2lowercase,
+               load_variables, get_variables)
+
+CALL_TIMEOUT_S = 1.0
+
+
+def _parse_var(token: str) -> int:
+    """Hash from an int literal (may be negative) or a variable name."""
+    try:
+        return int(token, 0)
+    except ValueError:
+        return djb2lowercase(token)
+
+
+_writable = None
+
+def _config_hash(name: str) -> int:
+    """Hash for a writable (source == 'config') variable name, else ValueError."""
+    global _writable
+    if _writable is None:
+        _writable = {it.get('name', '').lower(): int(it.get('hash'))
+                     for it in load_variables() if it.get('source') == 'config'}
+    h = _writable.get(str(name).lower())
+    if h is None:
+        raise ValueError(f'variable "{name}" is not writable (source is not "config" or not found)')
+    return h
+
+
+def _fmt(v) -> str:
+    return 'error: no response' if v is None else repr(v)
+
+
+def _parser(cmd: str, usage: str):
+    """ArgumentParser for a subcommand with options; errors raise ValueError (see _parse)."""
+    import argparse  # only the commands that take options pay for it, not `epic get`
+
+    class Parser(argparse.ArgumentParser):
+        def error(self, message):
+            raise ValueError(message)
+
+    return Parser(prog=f'epic {cmd}', usage=f'%(prog)s {usage}')
+
+
+def _parse(ap, argv: list):
+    """Namespace, or None after printing the usage line and what was wrong."""
+    try:
+        return ap.parse_intermixed_args(argv)
+    except ValueError as e:
+        print(ap.format_usage().rstrip())
+        print(f'error: {e}')
+        return None
+
+
+def _arg_type(fn):
+    """argparse type from a parser raising ValueError, keeping its message."""
+    def convert(token: str):
+        try:
+            return fn(token)
+        except ValueError as e:
+            import argparse
+            raise argparse.ArgumentTypeError(f'{token!r}: {e}') from None
+    return convert
+
+
+def _int0(token: str) -> int:
+    try:
+        return int(token, 0)
+    except ValueError:
+        raise ValueError('not an integer') from None
+
+
+# ----- single-shot commands -----
+
+def cmd_get(iface: str, argv: list) -> int:
+    if len(argv) < 2:
+        print('usage: epic get <ecu_addr:0..15> <var_name | hash:int> [more vars...]')
+        return 1
+    ecu = int(argv[0], 0)
+    hashes = [_parse_var(t) for t in argv[1:]]
+    values = get_variables(can_socket(iface), hashes, dest=ecu)
+    rc = 0
+    for h in hashes:
+        print(_fmt(values[h]))
+        rc |= values[h] is None
+    return rc
+
+
+def cmd_set(iface: str, argv: list) -> int:
+    if len(argv) != 3:
+        print('usage: epic set <ecu_addr:0..15> <var_name> <value_float>')
+        return 1
+    ecu = int(argv[0], 0)
+    try:
+        h = _config_hash(argv[1])
+    except ValueError as e:
+        print(f'error: {e}')
+        return 2
+    set_variable(can_socket(iface), h, float(argv[2]), ecu_addr=ecu)
+    return 0
+
+
+def cmd_call(iface: str, argv: list) -> int:
+    if len(argv) < 2:
+        print('usage: epic call <dest_ecu:0..15> <func_id:int|name> [arg_f32:float] [arg2_i16:int]')
+        return 1
+    s = can_socket(iface)
+    s.settimeout(CALL_TIMEOUT_S)
+    try:
+        ret = call_function(s, argv[1], float(argv[2]) if len(argv) > 2 else 0.0, dest=int(argv[0], 0),
+                            arg2_i16=int(argv[3], 0) if len(argv) > 3 else None)
+    except socket.timeout:
+        print('error: no response')
+        return 1
+    print(ret)
+    return 0
+
+
+# ----- batch mode -----
+
+def _parse_line(line: str) -> dict:
+    """Parse one batch command; text lines mirror the subcommand arguments.
+
+    get <ecu> <var|hash>
+    set <ecu> <var> <value>
+    call <ecu> <func> [arg] [arg2]
+    {"op": "get", "ecu": 0, "var": "rpm"}   (JSON form; replies are JSON too)
+    """
+    if line.startswith('{'):
+        cmd = json.loads(line)
+        cmd['json'] = True
+        cmd['ecu'] = int(cmd.get('ecu', 0))
+        return cmd
+    parts = line.split()
+    op = parts[0].lower()
+    if op not in ('get', 'set', 'call'):
+        raise ValueError(f'unknown op: {op}')
+    cmd = {'op': op, 'ecu': int(parts[1], 0), 'json': False}
+    if op == 'get':
+        cmd['var'] = parts[2]
+    elif op == 'set':
+        cmd['var'] = parts[2]
+        cmd['value'] = float(parts[3])
+    elif op == 'call':
+        cmd['func'] = parts[2]
+        cmd['arg'] = float(parts[3]) if len(parts) > 3 else 0.0
+        cmd['arg2'] = int(parts[4], 0) if len(parts) > 4 else None
+    return cmd
+
+
+def _reply(cmd: dict | None, value=None, error: str | None = None) -> str:
+    if cmd is not None and cmd.get('json'):
+        out = {'op': cmd.get('op')}
+        if error is not None:
+            out['error'] = error
+        elif value is not None:
+            out['value'] = value
+        return json.dumps(out, separators=(',', ':'))
+    if error is not None:
+        return f'error: {error}'
+    return 'ok' if value is None else repr(value)
+
+
+def _run_gets(sock, gets: list) -> list:
+    """Pipeline a run of consecutive get commands, one window per ECU."""
+    by_ecu = {}
+    for cmd in gets:
+        by_ecu.setdefault(cmd['ecu'], []).append(cmd['hash'])
+    values = {ecu: get_variables(sock, hashes, dest=ecu) for ecu, hashes in by_ecu.items()}
+    out = []
+    for cmd in gets:
+        v = values[cmd['ecu']][cmd['hash']]
+        out.append(_reply(cmd, error='no response') if v is None else _reply(cmd, v))
+    return out
+
+
+def run_batch(sock, lines) -> list:
+    """Execute a chunk of batch lines in order, returning one reply per command."""
+    out = []
+    gets = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            cmd = _parse_line(line)
+            op = cmd['op']
+            if op == 'get':
+                cmd['hash'] = cmd['var'] if isinstance(cmd['var'], int) else _parse_var(cmd['var'])
+                gets.append(cmd)
+                continue
+        except (ValueError, KeyError, IndexError, TypeError, struct.error) as e:
+            out += _run_gets(sock, gets)
+            gets = []
+            msg = str(e) if isinstance(e, ValueError) else f'malformed command: {line}'
+            # a JSON line gets a JSON error even when it did not parse
+            out.append(_reply({'json': line.startswith('{'), 'op': None}, error=msg))
+            continue
+        if gets:
+            out += _run_gets(sock, gets)
+            gets = []
+        try:
+            if op == 'set':
+                set_variable(sock, _config_hash(cmd['var']), float(cmd['value']), ecu_addr=cmd['ecu'])
+                out.append(_reply(cmd))
+            elif op == 'call':
+                arg2 = cmd.get('arg2')
+                ret = call_function(sock, cmd['func'], float(cmd.get('arg', 0.0)), dest=cmd['ecu'],
+                                    arg2_i16=None if arg2 is None else int(arg2))
+                out.append(_reply(cmd, ret))
+            else:
+                out.append(_reply(cmd, error=f'unknown op: {op}'))
+        except socket.timeout:
+            out.append(_reply(cmd, error='no response'))
+        except (ValueError, KeyError, TypeError, struct.error) as e:
+            out.append(_reply(cmd, error=str(e)))
+    out += _run_gets(sock, gets)
+    return out
+
+
+def _read_chunks(fd: int):
+    """Yield lists of complete lines, one list per read() worth of input.
+
+    Everything that arrived together is pipelined together, while an
+    interactive writer still gets a reply as soon as its line is complete.
+    """
+    rest = b''
+    while True:
+        buf = os.read(fd, 65536)
+        if not buf:
+            break
+        lines = (rest + buf).split(b'\n')
+        rest = lines.pop()
+        if lines:
+            yield [ln.decode('utf-8', errors='replace') for ln in lines]
+    if rest:
+        yield [rest.decode('utf-8', errors='replace')]
+
+
+def cmd_batch(iface: str, argv: list) -> int:
+    if len(argv) > 1:
+        print('usage: epic batch [file | -]   # newline- or JSON-delimited get/set/call commands')
+        return 1
+    src = argv[0] if argv else '-'
+    fd = sys.stdin.fileno() if src == '-' else os.open(src, os.O_RDONLY)
+    sock = can_socket(iface)
+    sock.settimeout(CALL_TIMEOUT_S)
+    write = sys.stdout.write
+    try:
+        for lines in _read_chunks(fd):
+            for reply in run_batch(sock, lines):
+                write(reply + '\n')
+            sys.stdout.flush()
+    finally:
+        if src != '-':
+            os.close(fd)
+    return 0
+
+
+# ----- multi-interface polling -----
+
+def _parse_target(token: str):
+    """IFACE:ECU:var1,var2,... -> (iface, ecu, [(name, hash), ...])"""
+    parts = token.split(':', 2)
+    if len(parts) != 3:
+        raise ValueError('expected IFACE:ECU:var1,var2')
+    iface, ecu, names = parts
+    return iface, _int0(ecu), [(n, _parse_var(n)) for n in names.split(',') if n]
+
+
+def _bus_ecu(token: str):
+    """[IFACE:]ECU -> (iface or None, ecu)"""
+    bus, _, ecu = token.rpartition(':')
+    return bus or None, _int0(ecu)
+
+
+def cmd_poll(iface: str, argv: list) -> int:
+    ap = _parser('poll', 'IFACE:ECU:var1,var2 [IFACE:ECU:...] [--rate HZ] [--duration S] [--skip-dead] '
+                         '[--derived FILE]')
+    ap.add_argument('targets', nargs='+', type=_arg_type(_parse_target), metavar='IFACE:ECU:vars')
+    ap.add_argument('--rate', type=float, metavar='HZ')
+    ap.add_argument('--duration', type=float, metavar='S')
+    ap.add_argument('--skip-dead', action='store_true')
+    ap.add_argument('--derived', metavar='FILE')
+    args = _parse(ap, argv)
+    if args is None:
+        return 1
+    from .multibus import MultiBusPoller
+    defs = {}
+    if args.derived:
+        try:
+            with open(args.derived, encoding='utf-8') as f:
+                defs = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f'error: --derived: {e}', file=sys.stderr)
+            return 1
+    poller = MultiBusPoller(rate_hz=args.rate)
+    names = {}
+    engines = {}  # (iface, ecu) -> (DerivedChannels, {derived name: hash} to print)
+    shown = set()  # (iface, ecu, hash) rows to print
+    for bus, ecu, items in args.targets:
+        wanted = [(n, h) for n, h in items if n in defs]
+        items = [(n, h) for n, h in items if n not in defs]
+        shown.update((bus, ecu, h) for _, h in items)
+        if wanted:
+            from .derived import DerivedChannels
+            # one engine per ECU: avg()/ema() state is per data stream
+            try:
+                engine = DerivedChannels(defs)
+            except ValueError as e:
+                print(f'error: --derived: {e}', file=sys.stderr)
+                return 1
+            engines[(bus, ecu)] = (engine, dict(wanted))
+            have = {n for n, _ in items}
+            items += [(n, djb2lowercase(n)) for n in sorted(engine.inputs_of(n for n, _ in wanted)) if n not in have]
+        hashes = [h for _, h in items]
+        if args.skip_dead:
+            from . import probe
+            sock = can_socket(bus)
+            live = probe.live_hashes(probe.support_for(sock, ecu))
+            sock.close()
+            dead = [n for n, h in items if h not in live]
+            if dead:
+                print(f'# {bus}:{ecu} skipping silent: {" ".join(dead)}', file=sys.stderr)
+            hashes = [h for h in hashes if h in live]
+        if hashes:
+            poller.add(bus, ecu, hashes)
+        names.update((h, n) for n, h in items)
+    write = sys.stdout.write
+    write('ts,iface,ecu,hash,name,value\n')
+    try:
+        for s in poller.run(duration_s=args.duration):
+            name = names.get(s.hash, '')
+            if (s.iface, s.ecu, s.hash) in shown:
+                write(f'{s.ts:.6f},{s.iface},{s.ecu},{s.hash},{name},{s.value!r}\n')
+            engine = engines.get((s.iface, s.ecu))
+            if engine is not None and name:
+                for n, v in engine[0].update({name: s.value}).items():
+                    h = engine[1].get(n)
+                    if h is not None:
+                        write(f'{s.ts:.6f},{s.iface},{s.ecu},{h},{n},{v!r}\n')
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
+    finally:
+        poller.close()
+        sys.stdout.flush()
+    return 0
+
+
+def cmd_alarms(iface: str, argv: list) -> int:
+    """Poll the inputs of a rule file and print every trip / clear as it happens."""
+    ap = _parser('alarms', '[IFACE:]ECU rules.json [--rate HZ] [--duration S] [--derived FILE]')
+    ap.add_argument('target', type=_arg_type(_bus_ecu))
+    ap.add_argument('rules')
+    ap.add_argument('--rate', type=float, metavar='HZ')
+    ap.add_argument('--duration', type=float, metavar='S')
+    ap.add_argument('--derived', metavar='FILE')
+    args = _parse(ap, argv)
+    if args is None:
+        return 1
+    bus, ecu = args.target
+    bus = bus or iface
+    from .alarms import AlarmEngine
+    from .multibus import MultiBusPoller
+    poller = MultiBusPoller(rate_hz=args.rate)
+    poller.add(bus, ecu, [])
+    engine = AlarmEngine()
+    derived = None
+    try:
+        # "call" actions go out on the poller's socket, between requests
+        engine.load(args.rules, sock=poller.buses[bus].sock, dest=ecu)
+        if args.derived:
+            from .derived import DerivedChannels
+            derived = DerivedChannels.from_file(args.derived)
+    except (OSError, ValueError) as e:
+        poller.close()
+        print(f'error: {e}', file=sys.stderr)
+        return 1
+    inputs = engine.inputs
+    if derived is not None:
+        inputs = derived.inputs_of(inputs)
+    names = {djb2lowercase(n): n for n in inputs}
+    poller.add(bus, ecu, list(names))
+    print(f'# {len(engine.rules)} rules over {len(names)} variables on {bus}:{ecu}', file=sys.stderr)
+    try:
+        for s in poller.run(duration_s=args.duration):
+            name = names.get(s.hash)
+            if name is None:
+                continue
+            events = engine.feed(name, s.value, s.ts)
+            if derived is not None:
+                for n, v in derived.update({name: s.value}).items():
+                    events += engine.feed(n, v, s.ts)
+            for ev in events:
+                vals = ' '.join(f'{k}={_fmt(v)}' for k, v in ev.inputs.items())
+                print(f'{ev.ts:.3f} {ev.kind.upper():5} {ev.rule} {vals}', flush=True)
+                for err in ev.errors:
+                    print(f'# {ev.rule}: {err}', file=sys.stderr)
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
+    finally:
+        poller.close()
+    active = engine.active()
+    if active:
+        print(f'# still active: {" ".join(r.name for r in active)}', file=sys.stderr)
+    return 0
+
+
+# ----- calibration dump / restore -----
+
+def cmd_dump(iface: str, argv: list) -> int:
+    if len(argv) != 2:
+        print('usage: epic dump <ecu_addr:0..15> <file.json[.gz]>')
+        return 1
+    from . import calibration
+    ecu = int(argv[0], 0)
+    t0 = time.perf_counter()
+    values, missing = calibration.dump(can_socket(iface), dest=ecu)
+    calibration.save(argv[1], values, ecu=ecu)
+    print(f'saved {len(values)} config values to {argv[1]} in {time.perf_counter() - t0:.2f}s')
+    if missing:
+        print(f'warning: {len(missing)} variables did not answer: {" ".join(missing[:10])}{" ..." if len(missing) > 10 else ""}')
+    return 0
+
+
+def cmd_restore(iface: str, argv: list) -> int:
+    ap = _parser('restore', '<ecu_addr:0..15> <file.json[.gz]> [--rate WRITES_PER_S] [--dry-run]')
+    ap.add_argument('ecu', type=_arg_type(_int0))
+    ap.add_argument('file')
+    ap.add_argument('--rate', type=float, default=500.0, metavar='WRITES_PER_S')
+    ap.add_argument('--dry-run', action='store_true')
+    args = _parse(ap, argv)
+    if args is None:
+        return 1
+    from . import calibration
+    try:
+        wanted = calibration.load(args.file)
+    except (OSError, EOFError, ValueError, TypeError) as e:  # EOFError: truncated .gz
+        print(f'error: {e}', file=sys.stderr)
+        return 1
+    t0 = time.perf_counter()
+    report = calibration.restore(can_socket(iface), wanted, dest=args.ecu, rate_hz=args.rate, dry_run=args.dry_run)
+    verb = 'would change' if args.dry_run else 'changed'
+    print(f"{verb} {len(report['changed'])}, unchanged {report['unchanged']} "
+          f"in {time.perf_counter() - t0:.2f}s")
+    for key in ('changed', 'unknown', 'unreadable', 'failed'):
+        if report[key] and (key != 'changed' or args.dry_run):
+            print(f'  {key}: {" ".join(report[key])}')
+    return 1 if report['failed'] else 0
+
+
+# ----- variable availability probe -----
+
+def cmd_probe(iface: str, argv: list) -> int:
+    ap = _parser('probe', '<ecu_addr:0..15> [--repeats N] [--force] [--list]')
+    ap.add_argument('ecu', type=_arg_type(_int0))
+    ap.add_argument('--repeats', type=_arg_type(_int0), default=1, metavar='N')
+    ap.add_argument('--force', action='store_true')
+    ap.add_argument('--list', action='store_true')
+    args = _parse(ap, argv)
+    if args is None:
+        return 1
+    ecu = args.ecu
+    from . import probe
+    sock = can_socket(iface)
+    t0 = time.perf_counter()
+    sig = probe.firmware_signature(sock, ecu)
+    cached = None if args.force or sig == 'unknown' else probe.load_support(ecu, sig)
+    state = cached if cached is not None else probe.support_for(sock, ecu, reprobe=True, repeats=args.repeats)
+    counts = {s: sum(1 for v in state.values() if v == s) for s in probe.STATES}
+    src = 'cache' if cached is not None else f'probe, {time.perf_counter() - t0:.2f}s'
+    print(f"ecu={ecu} firmware={sig}: ok={counts['ok']} zero={counts['zero']} silent={counts['silent']} ({src})")
+    if sig == 'unknown':
+        print('warning: ECU did not report a firmware signature; results not cached')
+    if args.list:
+        names = {int(it['hash']): it['name'] for it in load_variables()}
+        for h, s in sorted(state.items(), key=lambda kv: names.get(kv[0], '')):
+            print(f'  {names.get(h, h)!s:<40} {s}')
+    return 0
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""Fixed-period closed-loop control: read variables -> compute -> call_function.
+
+The loop runs on absolute deadlines (t0 + k * period, never "sleep(period)"),
+sleeps coarsely and spins for the last stretch, and keeps the hot path free
+of per-cycle setup: request frames, the receive buffer, the call frame and
+the input list are all built once in __init__.
+
+Optional real-time setup (SCHED_FIFO, CPU pinning, GC freeze) lives in
+realtime(); without root the loop still runs, just with more jitter.
+"""
+import gc
+import os
+import socket
+import struct
+import time
+
+from . import _FMT, _resolve_function_id
+
+_HDR = struct.Struct('=IB3x')
+_RSP = struct.Struct('>if')
+
+
+class realtime:
+    """Context manager: SCHED_FIFO + CPU affinity + frozen/disabled GC."""
+
+    def __init__(self, priority: int | None = None, cpus=None, freeze_gc: bool = True):
+        self.priority = priority
+        self.cpus = cpus
+        self.freeze_gc = freeze_gc
+        self.warnings = []
+        self._sched = None
+        self._affinity = None
+        self._gc_was_enabled = False
+
+    def __enter__(self):
+        if self.cpus is not None:
+            try:
+                self._affinity = os.sched_getaffinity(0)
+                os.sched_setaffinity(0, set(self.cpus))
+            except (OSError, AttributeError) as e:
+                self.warnings.append(f'CPU pinning failed: {e}')
+        if self.priority is not None:
+            try:
+                self._sched = (os.sched_getscheduler(0), os.sched_getparam(0))
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(self.priority))
+            except (OSError, AttributeError) as e:
+                self._sched = None
+                self.warnings.append(f'SCHED_FIFO failed (needs root or CAP_SYS_NICE): {e}')
+        if self.freeze_gc:
+            self._gc_was_enabled = gc.isenabled()
+            gc.collect()
+            gc.freeze()
+            gc.disable()
+        return self
+
+    def __exit__(self, *exc):
+        if self.freeze_gc:
+            gc.unfreeze()
+            if self._gc_was_enabled:
+                gc.enable()
+        if self._sched is not None:
+            try:
+                os.sched_setscheduler(0, self._sched[0], self._sched[1])
+            except OSError:
+                pass
+        if self._affinity is not None:
+            try:
+                os.sched_setaffinity(0, self._affinity)
+            except OSError:
+                pass
+        return False
+
+
+class ControlLoop:
+    """Run compute(inputs, got) every period and send its result via call_function.
+
+    compute receives the same preallocated lists on every cycle: inputs holds
+    one float per read hash (previous value kept if an ECU reply is missing)
+    and got[i] tells whether inputs[i] was answered this cycle. It returns the
+    float arg for the function, or None to skip the call this cycle.
+    Nothing is computed or sent until every input has been answered once, nor
+    after more than max_stale cycles in a row with a missing reply; those
+    cycles count as skipped_calls.
+    The call is sent fire-and-forget; its 0x760 reply is discarded by the next
+    read sweep.
+    """
+
+    def __init__(self, sock: socket.socket, read_hashes, compute, func: int | str, dest: int = 0,
+                 period_s: float = 0.002, read_budget: float = 0.5, spin_s: float = 0.0002,
+                 max_stale: int = 5, hist_bucket_us: int = 10, hist_buckets: int = 100):
+        self.sock = sock
+        self.compute = compute
+        self.dest = dest & 0x0F
+        self.period_ns = int(period_s * 1e9)
+        self.read_budget_ns = int(self.period_ns * read_budget)
+        self.spin_ns = int(spin_s * 1e9)
+        self.max_stale = max_stale
+        # preallocated frames and buffers
+        self.hashes = [int(h) for h in read_hashes]
+        self.slot = {h: i for i, h in enumerate(self.hashes)}
+        self.requests = [struct.pack(_FMT, 0x700 + self.dest, 4, struct.pack('>i', h) + bytes(4)) for h in self.hashes]
+        self.rsp_id = 0x720 + self.dest
+        self.inputs = [0.0] * len(self.hashes)
+        self.got = [False] * len(self.hashes)
+        self.seen = [False] * len(self.hashes)
+        self.unseen = len(self.hashes)  # inputs never answered yet
+        self.stale_run = 0              # consecutive cycles with a missing reply
+        self.rx = bytearray(16)
+        self.call = bytearray(struct.pack(_FMT, 0x740 + self.dest, 6, bytes(8)))
+        struct.pack_into('>H', self.call, 8, _resolve_function_id(func) & 0xFFFF)
+        # statistics
+        self.hist_bucket_ns = hist_bucket_us * 1000
+        self.hist = [0] * hist_buckets
+        self.cycles = 0
+        self.overruns = 0
+        self.stale_reads = 0
+        self.skipped_calls = 0
+        self.max_late_ns = 0
+        self.sum_late_ns = 0
+
+    def _read_inputs(self, deadline_ns: int) -> None:
+        sock = self.sock
+        got = self.got
+        for i in range(len(got)):
+            got[i] = False
+        for frame in self.requests:
+            sock.send(frame)
+        missing = len(got)
+        rx = self.rx
+        now = time.perf_counter_ns
+        while missing:
+            remaining = deadline_ns - now()
+            if remaining <= 0:
+                break
+            sock.settimeout(remaining / 1e9)
+            try:
+                sock.recv_into(rx, 16)
+            except socket.timeout:
+                break
+            can_id, _ = _HDR.unpack_from(rx, 0)
+            if can_id != self.rsp_id:
+                continue
+            h, v = _RSP.unpack_from(rx, 8)
+            i = self.slot.get(h)
+            if i is not None and not got[i]:
+                got[i] = True
+                self.inputs[i] = v
+                missing -= 1
+                if not self.seen[i]:
+                    self.seen[i] = True
+                    self.unseen -= 1
+        self.stale_reads += missing
+        self.stale_run = self.stale_run + 1 if missing else 0
+
+    def step(self, deadline_ns: int) -> None:
+        self._read_inputs(deadline_ns + self.read_budget_ns)
+        if self.unseen or self.stale_run > self.max_stale:
+            self.skipped_calls += 1  # never-read or long-held inputs: do not act on them
+            return
+        out = self.compute(self.inputs, self.got)
+        if out is not None:
+            struct.pack_into('>f', self.call, 10, out)
+            self.sock.send(self.call)
+
+    def run(self, cycles: int | None = None, duration_s: float | None = None) -> dict:
+        now = time.perf_counter_ns
+        period = self.period_ns
+        spin = self.spin_ns
+        hist = self.hist
+        last_bucket = len(hist) - 1
+        bucket_ns = self.hist_bucket_ns
+        end_ns = None if duration_s is None else now() + int(duration_s * 1e9)
+        prev_timeout = self.sock.gettimeout()
+        deadline = now() + period
+        try:
+            while (cycles is None or self.cycles < cycles) and (end_ns is None or deadline < end_ns):
+                remaining = deadline - now()
+                if remaining > spin:
+                    time.sleep((remaining - spin) / 1e9)
+                while now() < deadline:
+                    pass
+                late = now() - deadline
+                self.cycles += 1
+                self.sum_late_ns += late
+                if late > self.max_late_ns:
+                    self.max_late_ns = late
+                b = late // bucket_ns
+                hist[b if b < last_bucket else last_bucket] += 1
+                self.step(deadline)
+                deadline += period
+                t = now()
+                if t > deadline:
+                    # missed one or more deadlines: count them and realign
+                    missed = (t - deadline) // period + 1
+                    self.overruns += missed
+                    deadline += missed * period
+        finally:
+            self.sock.settimeout(prev_timeout)
+        return self.report()
+
+    def report(self) -> dict:
+        n = max(1, self.cycles)
+        bucket_us = self.hist_bucket_ns // 1000
+        return {
+            'cycles': self.cycles,
+            'overruns': self.overruns,
+            'stale_reads': self.stale_reads,
+            'skipped_calls': self.skipped_calls,
+            'mean_jitter_us': self.sum_late_ns / n / 1000,
+            'max_jitter_us': self.max_late_ns / 1000,
+            # [(bucket lower bound us, count)]; the last bucket is open-ended
+            'jitter_hist_us': [(i * bucket_us, c) for i, c in enumerate(self.hist) if c],
+        }
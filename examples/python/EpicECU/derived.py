@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""Derived channels: computed signals over live EPIC variables.
+
+Channels are Python-syntax expressions over catalog variable names (dotted
+names such as `afr.value1` work as written) and other derived channels:
+
+    {"afr": "lambdaValue * 14.7",
+     "boost": "MAPSensor - baroPressure",
+     "afr_avg": "avg(afr, 20)"}
+
+Each definition is parsed with `ast`, checked against a small whitelist and
+compiled once into a lambda. The channels form a dependency graph evaluated
+in topological order; update() only re-evaluates channels with an input
+that changed (or, for stateful functions, received a new sample).
+
+Functions: abs, min, max, sqrt, clamp(x, lo, hi), and the stateful
+avg(x, n) (rolling mean over the last n samples) and ema(x, alpha).
+"""
+import ast
+import json
+import math
+from pathlib import Path
+
+from . import djb2lowercase
+from .history import RingBuffer, History
+
+_PURE = {'abs': abs, 'min': min, 'max': max, 'sqrt': math.sqrt,
+         'clamp': lambda x, lo, hi: lo if x < lo else (hi if x > hi else x)}
+
+_ALLOWED = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp, ast.Call,
+            ast.Name, ast.Attribute, ast.Constant, ast.Load,
+            ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.USub, ast.UAdd,
+            ast.Not, ast.And, ast.Or, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+
+
+class _RollingMean:
+    def __init__(self, n):
+        self.ring = RingBuffer(int(n))
+
+    def __call__(self, x):
+        if math.isfinite(x):
+            self.ring.push(x)
+        return self.ring.avg() if self.ring.count else math.nan
+
+
+class _Ema:
+    def __init__(self, alpha):
+        self.alpha = float(alpha)
+        self.y = None
+
+    def __call__(self, x):
+        self.y = x if self.y is None else self.y + self.alpha * (x - self.y)
+        return self.y
+
+
+_STATEFUL = {'avg': _RollingMean, 'ema': _Ema}
+
+# function -> (min args, max args or None)
+_ARITY = {'abs': (1, 1), 'sqrt': (1, 1), 'clamp': (3, 3), 'min': (2, None), 'max': (2, None),
+          'avg': (2, 2), 'ema': (2, 2)}
+
+
+def _dotted(node) -> str | None:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        base = _dotted(node.value)
+        return None if base is None else f'{base}.{node.attr}'
+    return None
+
+
+class _Rewrite(ast.NodeTransformer):
+    """Variable names -> _v['name'], avg/ema call sites -> _s[i](x)."""
+
+    def __init__(self, index_name: str):
+        self.index_name = index_name  # '_i' for batch evaluation, None for scalar
+        self.names = []
+        self.states = []  # (factory, const args)
+
+    def _load(self, name: str):
+        self.names.append(name)
+        ref = ast.Subscript(value=ast.Name(id='_v', ctx=ast.Load()), slice=ast.Constant(value=name), ctx=ast.Load())
+        if self.index_name:
+            ref = ast.Subscript(value=ref, slice=ast.Name(id=self.index_name, ctx=ast.Load()), ctx=ast.Load())
+        return ref
+
+    def visit_Name(self, node):
+        return self._load(node.id)
+
+    def visit_Attribute(self, node):
+        name = _dotted(node)
+        if name is None:
+            raise ValueError('attribute access is only allowed in dotted variable names')
+        return self._load(name)
+
+    def visit_Call(self, node):
+        fn = node.func.id if isinstance(node.func, ast.Name) else None
+        if node.keywords or fn is None:
+            raise ValueError('only plain calls to built-in channel functions are allowed')
+        if fn not in _ARITY:
+            raise ValueError(f'unknown function: {fn}')
+        lo, hi = _ARITY[fn]
+        if len(node.args) < lo or (hi is not None and len(node.args) > hi):
+            want = lo if lo == hi else f'at least {lo}'
+            raise ValueError(f'{fn}() takes {want} argument(s), got {len(node.args)}')
+        if fn in _STATEFUL:
+            if not isinstance(node.args[1], ast.Constant):
+                raise ValueError(f'{fn}(x, const) expects a constant second argument')
+            self.states.append((_STATEFUL[fn], node.args[1].value))
+            call = ast.Subscript(value=ast.Name(id='_s', ctx=ast.Load()),
+                                 slice=ast.Constant(value=len(self.states) - 1), ctx=ast.Load())
+            return ast.Call(func=call, args=[self.visit(node.args[0])], keywords=[])
+        return ast.Call(func=ast.Name(id=fn, ctx=ast.Load()), args=[self.visit(a) for a in node.args], keywords=[])
+
+
+def _compile(name: str, expr: str, batch: bool = False):
+    """-> (function, [input names], [state factories])"""
+    try:
+        tree = ast.parse(expr, mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f'{name}: {e.msg}') from None
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED):
+            raise ValueError(f'{name}: {type(node).__name__} is not allowed in channel expressions')
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f'{name}: only numeric constants are allowed, not {node.value!r}')
+    rw = _Rewrite('_i' if batch else None)
+    try:
+        body = rw.visit(tree.body)
+    except ValueError as e:
+        raise ValueError(f'{name}: {e}') from None
+    if batch:
+        # one list comprehension per batch: the loop runs in a single code object
+        body = ast.ListComp(elt=body, generators=[ast.comprehension(
+            target=ast.Name(id='_i', ctx=ast.Store()),
+            iter=ast.Call(func=ast.Name(id='range', ctx=ast.Load()), args=[ast.Name(id='_n', ctx=ast.Load())], keywords=[]),
+            ifs=[], is_async=0)])
+        params = ['_v', '_s', '_n']
+    else:
+        params = ['_v', '_s']
+    fn = ast.Expression(body=ast.Lambda(args=ast.arguments(
+        posonlyargs=[], args=[ast.arg(arg=p) for p in params], kwonlyargs=[], kw_defaults=[], defaults=[]),
+        body=body))
+    ast.fix_missing_locations(fn)
+    env = dict(_PURE, range=range, __builtins__={})
+    code = compile(fn, f'<derived:{name}>', 'eval')
+    return eval(code, env), list(dict.fromkeys(rw.names)), rw.states
+
+
+class _Channel:
+    def __init__(self, name: str, expr: str):
+        self.name = name
+        self.expr = expr
+        self.fn, self.inputs, factories = _compile(name, expr)
+        self.factories = factories
+        self.state = [f(arg) for f, arg in factories]
+        self.stateful = bool(self.state)
+        self._batch_fn = None
+
+    @property
+    def batch_fn(self):
+        """List-comprehension form for evaluate_batch(), compiled on first use."""
+        if self._batch_fn is None:
+            self._batch_fn = _compile(self.name, self.expr, batch=True)[0]
+        return self._batch_fn
+
+
+class DerivedChannels:
+    def __init__(self, defs: dict | None = None, history_len: int = 0):
+        self.history_len = history_len
+        self.channels = {}  # name -> _Channel
+        self.order = []     # topological evaluation order
+        self.values = {}    # latest value for raw inputs and derived channels
+        self.history = {}   # derived name -> History (when history_len > 0)
+        for name, expr in (defs or {}).items():
+            self.define(name, expr, _resort=False)
+        self._sort()
+
+    @classmethod
+    def from_file(cls, path, history_len: int = 0):
+        return cls(json.loads(Path(path).read_text(encoding='utf-8')), history_len)
+
+    def define(self, name: str, expr: str, _resort: bool = True) -> None:
+        self.channels[name] = _Channel(name, expr)
+        if self.history_len:
+            self.history[name] = History(self.history_len)
+        if _resort:
+            self._sort()
+
+    def _sort(self) -> None:
+        deps = {n: [d for d in ch.inputs if d in self.channels] for n, ch in self.channels.items()}
+        order = []
+        done = set()
+        visiting = set()
+
+        def visit(n):
+            if n in done:
+                return
+            if n in visiting:
+                raise ValueError(f'derived channel cycle through {n}')
+            visiting.add(n)
+            for d in deps[n]:
+                visit(d)
+            visiting.discard(n)
+            done.add(n)
+            order.append(n)
+
+        for n in self.channels:
+            visit(n)
+        self.order = order
+
+    @property
+    def inputs(self) -> set:
+        """Raw (non-derived) variable names needed by all channels."""
+        return {d for ch in self.channels.values() for d in ch.inputs if d not in self.channels}
+
+    def inputs_of(self, names) -> set:
+        """Raw variable names needed to compute the given channels."""
+        out = set()
+        stack = list(names)
+        seen = set()
+        while stack:
+            n = stack.pop()
+            if n in seen:
+                continue
+            seen.add(n)
+            ch = self.channels.get(n)
+            if ch is None:
+                out.add(n)
+            else:
+                stack.extend(ch.inputs)
+        return out
+
+    def input_hashes(self) -> dict:
+        return {djb2lowercase(n): n for n in self.inputs}
+
+    def update(self, samples: dict) -> dict:
+        """Feed {raw name: value}; returns {derived name: value} for channels that changed."""
+        values = self.values
+        changed = set()
+        touched = set(samples)
+        for n, v in samples.items():
+            if v is None:
+                touched.discard(n)  # not answered this cycle
+                continue
+            if values.get(n) != v:
+                values[n] = v
+                changed.add(n)
+        out = {}
+        for n in self.order:
+            ch = self.channels[n]
+            if not any(d in touched for d in ch.inputs):
+                continue
+            touched.add(n)  # a fresh sample, even if the value is unchanged
+            if not ch.stateful and not any(d in changed for d in ch.inputs):
+                continue
+            if any(d not in values for d in ch.inputs):
+                continue  # an input has not been seen yet
+            try:
+                v = float(ch.fn(values, ch.state))
+            except (ZeroDivisionError, ValueError, OverflowError, TypeError):
+                v = math.nan
+            old = values.get(n)
+            if old != v and not (old != old and v != v):
+                values[n] = v
+                changed.add(n)
+                out[n] = v
+                hist = self.history.get(n)
+                if hist is not None:
+                    hist.push(v)
+        return out
+
+    def evaluate_batch(self, columns: dict) -> dict:
+        """Evaluate every channel over equal-length input columns ({name: sequence}).
+
+        Runs with fresh state for avg/ema (e.g. re-processing a log), without
+        touching the live values. Returns {derived name: list}.
+        """
+        n = min((len(c) for c in columns.values()), default=0)
+        cols = dict(columns)
+        out = {}
+        for name in self.order:
+            ch = self.channels[name]
+            missing = [d for d in ch.inputs if d not in cols]
+            if missing:
+                raise ValueError(f'{name}: missing input columns {missing}')
+            try:
+                col = ch.batch_fn(cols, [f(arg) for f, arg in ch.factories], n)
+            except (ZeroDivisionError, ValueError, OverflowError, TypeError):
+                # fall back to per-row evaluation so one bad row does not sink the column
+                state = [f(arg) for f, arg in ch.factories]
+                col = []
+                for i in range(n):
+                    row = {d: cols[d][i] for d in ch.inputs}
+                    try:
+                        col.append(float(ch.fn(row, state)))
+                    except (ZeroDivisionError, ValueError, OverflowError, TypeError):
+                        col.append(math.nan)
+            cols[name] = out[name] = col
+        return out
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Fixed-capacity value history for live EPIC variables.
+
+RingBuffer stores floats in a preallocated array('d'); memory never grows
+after construction. History stacks several rings: level 0 holds raw samples,
+each higher level holds the min and max of every `factor` samples of the
+level below, so the same memory covers factor x more time per level.
+"""
+import math
+from array import array
+
+SPARK = '▁▂▃▄▅▆▇█'
+
+
+class RingBuffer:
+    def __init__(self, capacity: int):
+        self.capacity = max(1, int(capacity))
+        self.buf = array('d', bytes(8 * self.capacity))
+        self.head = 0    # next write position
+        self.count = 0
+        self.sum = 0.0
+        self._min = None
+        self._max = None
+        self._dirty = False  # min/max need a rescan after eviction
+
+    def push(self, v: float) -> None:
+        if self.count == self.capacity:
+            old = self.buf[self.head]
+            self.sum -= old
+            if old == self._min or old == self._max:
+                self._dirty = True
+        else:
+            self.count += 1
+        self.buf[self.head] = v
+        self.head = (self.head + 1) % self.capacity
+        self.sum += v
+        if not self._dirty:
+            if self._min is None or v < self._min:
+                self._min = v
+            if self._max is None or v > self._max:
+                self._max = v
+
+    def _rescan(self) -> None:
+        vals = self.values()
+        self._min = min(vals) if vals else None
+        self._max = max(vals) if vals else None
+        self._dirty = False
+
+    def min(self):
+        if self._dirty:
+            self._rescan()
+        return self._min
+
+    def max(self):
+        if self._dirty:
+            self._rescan()
+        return self._max
+
+    def avg(self):
+        return self.sum / self.count if self.count else None
+
+    def values(self, n: int | None = None) -> list:
+        """Last n samples (all if None), oldest first."""
+        n = self.count if n is None else max(0, min(n, self.count))
+        start = (self.head - n) % self.capacity
+        if start + n <= self.capacity:
+            return self.buf[start:start + n].tolist()
+        return self.buf[start:].tolist() + self.buf[:self.head].tolist()
+
+
+class History:
+    def __init__(self, capacity: int = 256, levels: int = 3, factor: int = 8):
+        self.factor = max(2, int(factor))
+        self.raw = RingBuffer(capacity)
+        # per coarse level: (mins, maxs) rings plus the pending bucket
+        self.mins = [RingBuffer(capacity) for _ in range(levels - 1)]
+        self.maxs = [RingBuffer(capacity) for _ in range(levels - 1)]
+        self._pend = [[0, 0.0, 0.0] for _ in range(levels - 1)]  # [n, min, max]
+        self.version = 0  # bumps on every push; lets renderers cache output
+
+    @property
+    def levels(self) -> int:
+        return 1 + len(self.mins)
+
+    def push(self, v: float) -> None:
+        if not math.isfinite(v):
+            return  # NaN/inf would poison the running sum and the sparkline scale
+        self.raw.push(v)
+        self.version += 1
+        lo = hi = v
+        for lvl, pend in enumerate(self._pend):
+            if pend[0] == 0:
+                pend[1], pend[2] = lo, hi
+            else:
+                if lo < pend[1]:
+                    pend[1] = lo
+                if hi > pend[2]:
+                    pend[2] = hi
+            pend[0] += 1
+            if pend[0] < self.factor:
+                break
+            lo, hi = pend[1], pend[2]
+            pend[0] = 0
+            self.mins[lvl].push(lo)
+            self.maxs[lvl].push(hi)
+
+    def stats(self):
+        """(min, max, avg) over the raw window, or (None, None, None) if empty."""
+        return self.raw.min(), self.raw.max(), self.raw.avg()
+
+    def series(self, n: int, level: int = 0):
+        """Last n (low, high) points at a resolution level, oldest first."""
+        if level <= 0 or not self.mins:
+            vals = self.raw.values(n)
+            return vals, vals
+        level = min(level, len(self.mins))
+        return self.mins[level - 1].values(n), self.maxs[level - 1].values(n)
+
+    def sparkline(self, width: int, level: int = 0) -> str:
+        lows, highs = self.series(width, level)
+        if not highs:
+            return ''
+        lo, hi = min(lows), max(highs)
+        span = hi - lo
+        if span <= 0:
+            return SPARK[0] * len(highs)
+        top = len(SPARK) - 1
+        return ''.join(SPARK[int((v - lo) / span * top + 0.5)] for v in highs)
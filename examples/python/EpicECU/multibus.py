@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""Poll EPIC ECUs on several SocketCAN interfaces from one selector loop.
+
+Each interface gets one non-blocking socket and, per ECU on that bus, a
+request queue plus an adaptive pacer (see pacing.py). The loop keeps every
+bus busy at once and yields samples from all buses as a single stream in
+receive order, stamped from one wall clock so buses line up in time.
+"""
+import time
+import errno
+import struct
+import selectors
+from collections import deque, namedtuple
+
+from . import can_socket, recv_frame, send_frame
+from .pacing import Pacing
+
+Sample = namedtuple('Sample', 'ts iface ecu hash value')
+
+
+class _EcuState:
+    def __init__(self, ecu: int, hashes, pacer):
+        self.ecu = ecu
+        self.req_id = 0x700 + ecu
+        self.hashes = list(hashes)
+        self.queue = deque()
+        self.pending = {}  # hash -> send time (perf_counter)
+        self.pacer = pacer
+        self.last_send = 0.0
+        self.sweep_start = None
+        self.next_sweep = 0.0
+
+
+class _Bus:
+    def __init__(self, iface: str):
+        self.iface = iface
+        self.sock = can_socket(iface)
+        self.sock.setblocking(False)
+        self.ecus = {}  # ecu -> _EcuState
+
+
+class MultiBusPoller:
+    def __init__(self, rate_hz: float | None = None, **pacer_defaults):
+        """rate_hz: sweeps per second per ECU (None = back-to-back sweeps)."""
+        self.period_s = None if not rate_hz else 1.0 / rate_hz
+        self.pacing = {}  # iface -> Pacing
+        self.pacer_defaults = pacer_defaults
+        self.buses = {}   # iface -> _Bus
+        self.sel = selectors.DefaultSelector()
+        self.lost = 0
+        self.sweeps = 0
+
+    def add(self, iface: str, ecu: int, hashes) -> None:
+        bus = self.buses.get(iface)
+        if bus is None:
+            bus = self.buses[iface] = _Bus(iface)
+            self.pacing[iface] = Pacing(**self.pacer_defaults)
+            self.sel.register(bus.sock, selectors.EVENT_READ, bus)
+        ecu &= 0x0F
+        st = bus.ecus.get(ecu)
+        if st is None:
+            bus.ecus[ecu] = _EcuState(ecu, dict.fromkeys(int(h) for h in hashes), self.pacing[iface].for_ecu(ecu))
+        else:
+            st.hashes = list(dict.fromkeys(st.hashes + [int(h) for h in hashes]))
+
+    def tuning(self) -> dict:
+        return {iface: p.tuning() for iface, p in self.pacing.items()}
+
+    def close(self) -> None:
+        for bus in self.buses.values():
+            self.sel.unregister(bus.sock)
+            bus.sock.close()
+        self.buses.clear()
+
+    def _pump(self, bus: _Bus, now: float) -> float:
+        """Send whatever each ECU's window allows; return the next time to wake."""
+        wake = now + 1.0
+        for st in bus.ecus.values():
+            if not st.queue and not st.pending:
+                if st.sweep_start is not None:
+                    self.sweeps += 1
+                    st.sweep_start = None
+                if now < st.next_sweep:
+                    wake = min(wake, st.next_sweep)
+                    continue
+                st.queue.extend(st.hashes)
+                st.sweep_start = now
+                st.next_sweep = now + (self.period_s or 0.0)
+            p = st.pacer
+            while st.queue and len(st.pending) < p.depth:
+                if now < st.last_send + p.gap_s:
+                    wake = min(wake, st.last_send + p.gap_s)
+                    break
+                h = st.queue[0]
+                try:
+                    send_frame(bus.sock, st.req_id, struct.pack('>i', h))
+                except OSError as e:
+                    if e.errno in (errno.ENOBUFS, errno.EAGAIN):
+                        wake = min(wake, now + 0.0005)
+                        break
+                    raise
+                st.queue.popleft()
+                p.on_sent()
+                st.pending[h] = now
+                st.last_send = now
+            if st.pending:
+                wake = min(wake, min(st.pending.values()) + p.timeout_s)
+        return wake
+
+    def _expire(self, bus: _Bus, now: float) -> None:
+        for st in bus.ecus.values():
+            timeout = st.pacer.timeout_s
+            for h in [h for h, t0 in st.pending.items() if now - t0 >= timeout]:
+                st.pacer.on_loss(sent_s=st.pending.pop(h))
+                self.lost += 1
+
+    def _drain(self, bus: _Bus, out: list) -> None:
+        perf_counter = time.perf_counter
+        wall = time.time
+        while True:
+            try:
+                rx_id, _, payload = recv_frame(bus.sock)
+            except (BlockingIOError, InterruptedError):
+                return
+            if (rx_id & 0x7F0) != 0x720:
+                continue
+            st = bus.ecus.get(rx_id & 0x0F)
+            if st is None:
+                continue
+            h = struct.unpack('>i', payload[0:4])[0]
+            t0 = st.pending.pop(h, None)
+            if t0 is None:
+                continue
+            # clocks are read per frame: a drain can cover a long burst, and a
+            # stamp taken before it would understate every RTT after the first
+            st.pacer.on_response(perf_counter() - t0)
+            out.append(Sample(wall(), bus.iface, st.ecu, h, struct.unpack('>f', payload[4:8])[0]))
+
+    def run(self, duration_s: float | None = None, max_sweeps: int | None = None):
+        """Generator of Sample tuples from all buses, in receive order.
+
+        Stops after duration_s, or once max_sweeps ECU sweeps (summed over all
+        buses) have completed; runs forever if neither is given.
+        """
+        end = None if duration_s is None else time.perf_counter() + duration_s
+        out = []
+        while (end is None or time.perf_counter() < end) and (max_sweeps is None or self.sweeps < max_sweeps):
+            now = time.perf_counter()
+            wake = now + 1.0
+            for bus in self.buses.values():
+                self._expire(bus, now)
+                wake = min(wake, self._pump(bus, now))
+            if end is not None:
+                wake = min(wake, end)
+            for key, _ in self.sel.select(max(0.0, wake - time.perf_counter())):
+                self._drain(key.data, out)
+            if out:
+                yield from out
+                out.clear()
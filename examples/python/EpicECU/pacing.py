@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""Adaptive per-ECU request pacing for pipelined 0x700 variable reads.
+
+Each ECU gets an ``EcuPacer`` that tracks round-trip time and unanswered
+requests and tunes two knobs with AIMD (additive increase, multiplicative
+decrease):
+
+- window: how many requests may be outstanding at once
+- gap:    minimum delay between back-to-back request frames
+
+Every answered request grows the window by ~1 per window-full of replies
+and shrinks the gap. A loss event halves the window; requests that were
+already in flight when the window was cut belong to the same event, so a
+burst of drops halves it once. Once the window is at its floor, losses
+double the gap instead. The timeout itself follows the observed RTT
+(TCP-style SRTT/RTTVAR, without samples from retransmitted requests), so
+busy ECUs get more slack automatically.
+"""
+import socket
+import struct
+import time
+
+from . import send_frame, recv_frame
+
+
+class EcuPacer:
+    def __init__(self, window: float = 4.0, min_window: float = 1.0, max_window: float = 32.0,
+                 gap_s: float = 0.0002, min_gap_s: float = 0.0, max_gap_s: float = 0.005,
+                 min_timeout_s: float = 0.01, max_timeout_s: float = 0.25):
+        self.min_window = min_window
+        self.max_window = max_window
+        self.window = max(min_window, min(window, max_window))
+        self.min_gap_s = min_gap_s
+        self.max_gap_s = max_gap_s
+        self.gap_s = max(min_gap_s, min(gap_s, max_gap_s))
+        self.min_timeout_s = min_timeout_s
+        self.max_timeout_s = max_timeout_s
+        self.srtt_s = None    # smoothed RTT
+        self.rttvar_s = 0.0   # RTT mean deviation
+        self.decreased_s = float('-inf')  # perf_counter time of the last window cut
+        self.sent = 0
+        self.answered = 0
+        self.lost = 0
+
+    @property
+    def depth(self) -> int:
+        """Integer number of requests allowed in flight."""
+        return max(1, int(self.window))
+
+    @property
+    def timeout_s(self) -> float:
+        if self.srtt_s is None:
+            return self.max_timeout_s
+        rto = self.srtt_s + 4.0 * self.rttvar_s
+        return max(self.min_timeout_s, min(rto, self.max_timeout_s))
+
+    def on_sent(self) -> None:
+        self.sent += 1
+
+    def on_response(self, rtt_s: float | None) -> None:
+        """rtt_s=None for retransmitted requests: the reply may belong to either send."""
+        self.answered += 1
+        if rtt_s is None:
+            pass
+        elif self.srtt_s is None:
+            self.srtt_s = rtt_s
+            self.rttvar_s = rtt_s / 2.0
+        else:
+            self.rttvar_s = 0.75 * self.rttvar_s + 0.25 * abs(self.srtt_s - rtt_s)
+            self.srtt_s = 0.875 * self.srtt_s + 0.125 * rtt_s
+        # additive increase: about +1 window per window-full of answers
+        self.window = min(self.max_window, self.window + 1.0 / self.window)
+        self.gap_s = max(self.min_gap_s, self.gap_s * 0.95)
+
+    def on_loss(self, congestion: bool = True, sent_s: float | None = None) -> None:
+        """sent_s: perf_counter time the lost request was sent, if known."""
+        self.lost += 1
+        if congestion:
+            self.decrease(sent_s)
+
+    def decrease(self, sent_s: float | None = None) -> None:
+        """Multiplicative decrease for a loss already counted (or not counted) elsewhere."""
+        if sent_s is not None and sent_s <= self.decreased_s:
+            return  # in flight before the last cut: same loss event
+        self.decreased_s = time.perf_counter()
+        # multiplicative decrease; the gap only opens up once the window is at its floor
+        if self.window > self.min_window:
+            self.window = max(self.min_window, self.window / 2.0)
+        else:
+            self.gap_s = min(self.max_gap_s, max(self.gap_s * 2.0, 0.0001))
+
+    def tuning(self) -> dict:
+        """Snapshot of the current tuning and counters."""
+        return {
+            'window': self.depth,
+            'gap_us': round(self.gap_s * 1e6, 1),
+            'srtt_ms': None if self.srtt_s is None else round(self.srtt_s * 1e3, 3),
+            'timeout_ms': round(self.timeout_s * 1e3, 3),
+            'sent': self.sent,
+            'answered': self.answered,
+            'lost': self.lost,
+        }
+
+
+class Pacing:
+    """Registry of per-ECU pacers, created on first use."""
+
+    def __init__(self, **defaults):
+        self.defaults = defaults
+        self.ecus = {}  # ecu -> EcuPacer
+
+    def for_ecu(self, ecu: int) -> EcuPacer:
+        ecu &= 0x0F
+        p = self.ecus.get(ecu)
+        if p is None:
+            p = self.ecus[ecu] = EcuPacer(**self.defaults)
+        return p
+
+    def tuning(self) -> dict:
+        return {ecu: p.tuning() for ecu, p in sorted(self.ecus.items())}
+
+
+# Shared default registry so that separate calls to get_variables() against the
+# same ECU keep learning instead of starting from scratch.
+default_pacing = Pacing()
+
+
+def get_variables(sock: socket.socket, var_hashes, dest: int = 0, pacer: EcuPacer | None = None,
+                  retries: int = 1, silent_tolerant: bool = False) -> dict:
+    """Read many variables from one ECU with an adaptive in-flight window.
+
+    Returns {hash: value} for every requested hash; hashes that never got an
+    answer (after ``retries`` re-sends) map to None. Duplicate hashes are read
+    once.
+
+    silent_tolerant: for sweeps where many hashes are expected to go
+    unanswered (see probe.py; pass a private pacer). A timeout then only
+    shrinks the window if the RTT of answered requests has risen well above
+    the fastest one seen in this call, or if its retry gets an answer, so
+    unserved hashes do not collapse the window.
+    """
+    if pacer is None:
+        pacer = default_pacing.for_ecu(dest)
+    req_id = 0x700 + (dest & 0x0F)
+    rsp_id = 0x720 + (dest & 0x0F)
+    queue = []
+    seen = set()
+    for h in var_hashes:
+        h = int(h)
+        if h not in seen:
+            seen.add(h)
+            queue.append(h)
+    queue.reverse()  # pop() from the end keeps request order
+    results = {h: None for h in seen}
+    attempts = {}
+    pending = {}  # hash -> send time
+    rtt_floor = None  # fastest first-attempt RTT in this call
+    suspect = {}      # silent_tolerant: hash -> send time of a loss not (yet) blamed on congestion
+    last_send = 0.0
+    prev_timeout = sock.gettimeout()
+    try:
+        while queue or pending:
+            # fill the window, honouring the inter-frame gap
+            while queue and len(pending) < pacer.depth:
+                now = time.perf_counter()
+                wait = last_send + pacer.gap_s - now
+                if wait > 0:
+                    time.sleep(wait)
+                    now = time.perf_counter()
+                h = queue.pop()
+                send_frame(sock, req_id, struct.pack('>i', h))
+                pacer.on_sent()
+                attempts[h] = attempts.get(h, 0) + 1
+                pending[h] = now
+                last_send = now
+            # wait for the oldest outstanding request to answer or expire
+            deadline = min(pending.values()) + pacer.timeout_s
+            remaining = deadline - time.perf_counter()
+            if remaining > 0:
+                sock.settimeout(remaining)
+                try:
+                    rx_id, _, payload = recv_frame(sock)
+                except socket.timeout:
+                    rx_id = None
+                if rx_id == rsp_id:
+                    h = struct.unpack('>i', payload[0:4])[0]
+                    sent = pending.pop(h, None)
+                    if sent is not None:
+                        # Karn's rule: no RTT sample when the reply may answer an earlier send
+                        rtt = time.perf_counter() - sent if attempts[h] == 1 else None
+                        pacer.on_response(rtt)
+                        if rtt is not None and (rtt_floor is None or rtt < rtt_floor):
+                            rtt_floor = rtt
+                        results[h] = struct.unpack('>f', payload[4:8])[0]
+                        if h in suspect:
+                            # answered on retry: the earlier loss was congestion after all
+                            pacer.decrease(suspect.pop(h))
+            # expire anything past its deadline
+            now = time.perf_counter()
+            timeout = pacer.timeout_s
+            # RTT well above the floor means the ECU is queueing: timeouts are congestion
+            rising = rtt_floor is not None and pacer.srtt_s > 2.0 * rtt_floor + 0.001
+            for h in [h for h, t0 in pending.items() if now - t0 >= timeout]:
+                t0 = pending.pop(h)
+                if silent_tolerant and not rising:
+                    suspect[h] = t0
+                    pacer.on_loss(congestion=False)
+                else:
+                    pacer.on_loss(sent_s=t0)
+                if attempts[h] <= retries:
+                    queue.append(h)
+    finally:
+        sock.settimeout(prev_timeout)
+    return results
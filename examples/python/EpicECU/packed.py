@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""EPIC Over CANbus v2 packed group reads (client side + shared codec).
+
+v1 spends half of every reply echoing the 32-bit hash and carries a single
+float32. v2 registers a group of variables once, then one request returns
+all of them packed back to back (float32, float16 or scaled int16) in as few
+frames as possible, classic or CAN FD. See Docs/packet_basics.md.
+
+Frames (request 0x7A0 + ecu, response 0x7C0 + ecu):
+  HELLO   req [0]=0x01 [1]=client version        rsp [0]=0x01 [1]=version [2]=flags(bit0 FD) [3]=max groups [4]=max slots
+  DEFINE  req [0]=0x02 [1]=gid [2]=slot [3]=fmt [4..7]=hash    rsp [0]=0x02 [1]=gid [2]=slot [3]=status
+  READ    req [0]=0x03 [1]=gid [2]=seq [3]=flags(bit0 FD reply)
+  DATA    rsp [0]=0x80 | (seq & 7) << 4 | frame index [1]=gid [2..]=packed values
+
+Packing is deterministic on both ends: values are laid out in slot order
+and a value that does not fit in the rest of a frame starts the next one.
+"""
+import math
+import time
+import socket
+import struct
+
+from . import send_frame, recv_frame, get_variables
+
+VERSION = 2
+REQ_BASE = 0x7A0
+RSP_BASE = 0x7C0
+
+OP_HELLO = 0x01
+OP_DEFINE = 0x02
+OP_READ = 0x03
+DATA_FLAG = 0x80
+
+FLAG_FD = 0x01
+
+# fmt byte: high nibble = type, low nibble = decimal scale for I16 (raw = round(v * 10**scale))
+T_F32 = 0x0
+T_F16 = 0x1
+T_I16 = 0x2
+_SIZE = {T_F32: 4, T_F16: 2, T_I16: 2}
+_CODE = {T_F32: '>f', T_F16: '>e', T_I16: '>h'}
+
+STATUS_OK = 0
+STATUS_BAD_GROUP = 1
+STATUS_BAD_SLOT = 2
+STATUS_BAD_FORMAT = 3
+
+HEADER = 2
+CLASSIC_PAYLOAD = 8 - HEADER
+FD_PAYLOAD = 64 - HEADER
+MAX_FRAMES = 16
+
+
+def fmt_byte(kind: str = 'f32', scale: int = 0) -> int:
+    """'f32' | 'f16' | 'i16' (+ decimal scale 0..15 for i16) -> fmt byte."""
+    t = {'f32': T_F32, 'f16': T_F16, 'i16': T_I16}[kind]
+    return (t << 4) | (scale & 0x0F if t == T_I16 else 0)
+
+
+def layout(fmts, fd: bool = False) -> list:
+    """[(frame index, byte offset in frame payload)] for each slot."""
+    cap = FD_PAYLOAD if fd else CLASSIC_PAYLOAD
+    out = []
+    frame = 0
+    used = 0
+    for f in fmts:
+        size = _SIZE[f >> 4]
+        if used + size > cap:
+            frame += 1
+            used = 0
+        out.append((frame, used))
+        used += size
+    if out and out[-1][0] >= MAX_FRAMES:
+        raise ValueError(f'group does not fit in {MAX_FRAMES} frames')
+    return out
+
+
+def encode_value(f: int, v: float) -> bytes:
+    t = f >> 4
+    if t == T_I16:
+        raw = round(v * 10 ** (f & 0x0F)) if math.isfinite(v) else 0
+        return struct.pack('>h', max(-32768, min(32767, raw)))
+    if t == T_F16:
+        try:
+            return struct.pack('>e', v)
+        except OverflowError:
+            return struct.pack('>e', math.copysign(math.inf, v))
+    return struct.pack('>f', v)
+
+
+def decode_value(f: int, buf: bytes, off: int) -> float:
+    t = f >> 4
+    v = struct.unpack_from(_CODE[t], buf, off)[0]
+    if t == T_I16:
+        return v / 10 ** (f & 0x0F)
+    return float(v)
+
+
+def encode_frames(fmts, values, fd: bool = False) -> list:
+    """Pack slot values into frame payloads (without the 2-byte header)."""
+    slots = layout(fmts, fd)
+    n = (slots[-1][0] + 1) if slots else 0
+    frames = [bytearray() for _ in range(n)]
+    for (fi, off), f, v in zip(slots, fmts, values):
+        frames[fi][off:off] = encode_value(f, v)
+    return [bytes(b) for b in frames]
+
+
+def data_header(seq: int, index: int, gid: int) -> bytes:
+    return bytes([DATA_FLAG | ((seq & 0x07) << 4) | (index & 0x0F), gid & 0xFF])
+
+
+# ----- client -----
+
+def _await(sock, rsp_id: int, match, timeout_s: float):
+    """Return the payload of the first rsp_id frame accepted by match(), or None."""
+    prev = sock.gettimeout()
+    end = time.perf_counter() + timeout_s
+    try:
+        while True:
+            remaining = end - time.perf_counter()
+            if remaining <= 0:
+                return None
+            sock.settimeout(remaining)
+            try:
+                rx_id, _, payload = recv_frame(sock)
+            except socket.timeout:
+                return None
+            if rx_id == rsp_id and match(payload):
+                return payload
+    finally:
+        sock.settimeout(prev)
+
+
+def negotiate(sock: socket.socket, dest: int = 0, timeout_s: float = 0.05) -> dict | None:
+    """HELLO handshake; None means the ECU only speaks v1."""
+    dest &= 0x0F
+    send_frame(sock, REQ_BASE + dest, bytes([OP_HELLO, VERSION]))
+    p = _await(sock, RSP_BASE + dest, lambda p: p[0] == OP_HELLO, timeout_s)
+    if p is None or len(p) < 5 or p[1] < 2:
+        return None
+    return {'version': p[1], 'fd': bool(p[2] & FLAG_FD), 'max_groups': p[3], 'max_slots': p[4]}
+
+
+class PackedGroup:
+    """A registered variable group read with one request.
+
+    slots: list of (hash, fmt byte). Define once, then read() as often as needed.
+    """
+
+    def __init__(self, sock: socket.socket, slots, gid: int = 1, dest: int = 0, fd: bool = False,
+                 timeout_s: float = 0.05):
+        self.sock = sock
+        self.dest = dest & 0x0F
+        self.gid = gid & 0xFF
+        self.hashes = [int(h) for h, _ in slots]
+        self.fmts = [int(f) for _, f in slots]
+        self.fd = fd
+        self.timeout_s = timeout_s
+        self.slots = layout(self.fmts, fd)
+        self.nframes = (self.slots[-1][0] + 1) if self.slots else 0
+        self.seq = 0
+        self.req_id = REQ_BASE + self.dest
+        self.rsp_id = RSP_BASE + self.dest
+
+    def define(self) -> None:
+        for i, (h, f) in enumerate(zip(self.hashes, self.fmts)):
+            send_frame(self.sock, self.req_id, bytes([OP_DEFINE, self.gid, i, f]) + struct.pack('>i', h))
+            p = _await(self.sock, self.rsp_id,
+                       lambda p: p[0] == OP_DEFINE and p[1] == self.gid and p[2] == i, self.timeout_s)
+            if p is None:
+                raise TimeoutError(f'no DEFINE ack for group {self.gid} slot {i}')
+            if p[3] != STATUS_OK:
+                raise ValueError(f'ECU rejected group {self.gid} slot {i}: status {p[3]}')
+
+    def request(self) -> None:
+        """Send a READ; replies are fed back through accept()."""
+        self.seq = (self.seq + 1) & 0x07
+        self.frames = [None] * self.nframes
+        self.missing = self.nframes
+        send_frame(self.sock, self.req_id, bytes([OP_READ, self.gid, self.seq, FLAG_FD if self.fd else 0]))
+
+    def accept(self, payload: bytes) -> None:
+        b0 = payload[0]
+        if len(payload) < HEADER or not b0 & DATA_FLAG or payload[1] != self.gid or (b0 >> 4) & 0x07 != self.seq:
+            return
+        idx = b0 & 0x0F
+        if idx < self.nframes and self.frames[idx] is None:
+            self.frames[idx] = payload[HEADER:]
+            self.missing -= 1
+
+    def values(self, out: dict | None = None) -> dict:
+        """{hash: value} from the last reply; values in frames that did not arrive are None."""
+        out = {} if out is None else out
+        for h, f, (fi, off) in zip(self.hashes, self.fmts, self.slots):
+            buf = self.frames[fi]
+            out[h] = None if buf is None or off + _SIZE[f >> 4] > len(buf) else decode_value(f, buf, off)
+        return out
+
+    def read(self) -> dict:
+        self.request()
+        _collect(self.sock, self.rsp_id, {self.gid: self}, self.timeout_s)
+        return self.values()
+
+
+def _collect(sock, rsp_id: int, groups: dict, timeout_s: float) -> None:
+    """Feed DATA frames to their groups until all are complete or timeout_s passes."""
+    prev = sock.gettimeout()
+    end = time.perf_counter() + timeout_s
+    try:
+        while any(g.missing for g in groups.values()):
+            remaining = end - time.perf_counter()
+            if remaining <= 0:
+                break
+            sock.settimeout(remaining)
+            try:
+                rx_id, _, payload = recv_frame(sock)
+            except socket.timeout:
+                break
+            if rx_id == rsp_id and len(payload) >= HEADER:
+                g = groups.get(payload[1])
+                if g is not None:
+                    g.accept(payload)
+    finally:
+        sock.settimeout(prev)
+
+
+def group_capacity(fmt: int, fd: bool = False) -> int:
+    """How many values of one format fit in a single group."""
+    cap = FD_PAYLOAD if fd else CLASSIC_PAYLOAD
+    return (cap // _SIZE[fmt >> 4]) * MAX_FRAMES
+
+
+class GroupReader:
+    """Read a fixed set of variables with v2 packed groups when the ECU supports
+    them, falling back to pipelined v1 reads otherwise.
+
+    Sets larger than one group are split over consecutive group ids starting
+    at gid; all groups are requested back to back and collected together.
+    """
+
+    def __init__(self, sock: socket.socket, hashes, dest: int = 0, fmt: int = fmt_byte('f32'),
+                 gid: int = 1, fd: bool = False, timeout_s: float = 0.05):
+        self.sock = sock
+        self.dest = dest & 0x0F
+        self.hashes = [int(h) for h in hashes]
+        self.timeout_s = timeout_s
+        self.groups = {}  # gid -> PackedGroup
+        info = negotiate(sock, dest)
+        if info is None:
+            return
+        fd = fd and info['fd']
+        per_group = min(info['max_slots'], group_capacity(fmt, fd))
+        chunks = [self.hashes[i:i + per_group] for i in range(0, len(self.hashes), per_group)]
+        if gid + len(chunks) > info['max_groups']:
+            return
+        try:
+            for i, chunk in enumerate(chunks):
+                g = PackedGroup(sock, [(h, fmt) for h in chunk], gid=gid + i, dest=dest, fd=fd,
+                                timeout_s=timeout_s)
+                g.define()
+                self.groups[g.gid] = g
+        except (TimeoutError, ValueError):
+            self.groups = {}
+
+    @property
+    def version(self) -> int:
+        return 2 if self.groups else 1
+
+    def read(self) -> dict:
+        """{hash: value}; None for anything that did not arrive."""
+        if not self.groups:
+            return get_variables(self.sock, self.hashes, dest=self.dest)
+        for g in self.groups.values():
+            g.request()
+        _collect(self.sock, RSP_BASE + self.dest, self.groups, self.timeout_s)
+        out = {}
+        for g in self.groups.values():
+            g.values(out)
+        return out
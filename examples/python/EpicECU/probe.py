@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Find out which catalog variables an ECU actually answers, and remember it.
+
+probe() sweeps the catalog with pipelined reads and classifies each hash:
+- 'ok'     answered with a non-zero value at least once
+- 'zero'   answered, but only ever 0.0 (unknown hash, or a value that is 0 right now)
+- 'silent' never answered
+
+Results are cached per ECU address and firmware signature (firmwareVersion +
+firmwareSignatureHash as reported by the ECU, plus a digest of the catalog)
+under $XDG_CACHE_HOME/epic_can_bus, so tools can skip dead variables at
+start-up without probing again.
+"""
+import os
+import json
+import time
+import struct
+import socket
+import hashlib
+from pathlib import Path
+
+from . import load_variables, djb2lowercase, get_variables
+from .pacing import EcuPacer
+
+STATES = ('ok', 'zero', 'silent')
+SIGNATURE_VARS = ('firmwareVersion', 'firmwareSignatureHash')
+
+
+def cache_dir() -> Path:
+    base = os.environ.get('XDG_CACHE_HOME') or (Path.home() / '.cache')
+    return Path(base) / 'epic_can_bus'
+
+
+def catalog_digest(hashes=None) -> str:
+    if hashes is None:
+        hashes = [int(it['hash']) for it in load_variables()]
+    return hashlib.sha1(struct.pack(f'>{len(hashes)}i', *sorted(set(hashes)))).hexdigest()[:12]
+
+
+def firmware_signature(sock: socket.socket, dest: int = 0) -> str:
+    """Stable string identifying the ECU firmware build, or 'unknown'."""
+    hashes = [djb2lowercase(n) for n in SIGNATURE_VARS]
+    values = get_variables(sock, hashes, dest=dest)
+    if all(values[h] is None for h in hashes):
+        return 'unknown'
+    # hex of the raw float32 bits keeps the key exact
+    return '-'.join('none' if values[h] is None else struct.pack('>f', values[h]).hex() for h in hashes)
+
+
+def probe(sock: socket.socket, dest: int = 0, hashes=None, repeats: int = 1) -> dict:
+    """{hash: 'ok' | 'zero' | 'silent'} for every hash (default: whole catalog)."""
+    if hashes is None:
+        hashes = [int(it['hash']) for it in load_variables()]
+    state = dict.fromkeys((int(h) for h in hashes), 'silent')
+    # a private pacer: the sweep's timeouts must not leave the shared one for this ECU throttled
+    pacer = EcuPacer()
+    for _ in range(max(1, repeats)):
+        # only re-ask what could still be upgraded
+        todo = [h for h, s in state.items() if s != 'ok']
+        if not todo:
+            break
+        for h, v in get_variables(sock, todo, dest=dest, pacer=pacer, silent_tolerant=True).items():
+            if v is None:
+                continue
+            state[h] = 'zero' if v == 0.0 else 'ok'
+    return state
+
+
+def _cache_path(ecu: int, signature: str) -> Path:
+    return cache_dir() / f'support-ecu{ecu & 0x0F}-{signature}.json'
+
+
+def save_support(ecu: int, signature: str, state: dict) -> Path:
+    path = _cache_path(ecu, signature)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {'ecu': ecu & 0x0F, 'signature': signature, 'catalog': catalog_digest(), 'ts': time.time()}
+    for s in STATES:
+        data[s] = sorted(h for h, v in state.items() if v == s)
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(json.dumps(data, separators=(',', ':')), encoding='utf-8')
+    tmp.replace(path)
+    return path
+
+
+def load_support(ecu: int, signature: str) -> dict | None:
+    """Cached {hash: state}, or None if missing or made for a different catalog."""
+    path = _cache_path(ecu, signature)
+    try:
+        data = json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    if data.get('catalog') != catalog_digest():
+        return None
+    return {int(h): s for s in STATES for h in data.get(s, [])}
+
+
+def support_for(sock: socket.socket, dest: int = 0, reprobe: bool = False, repeats: int = 1) -> dict:
+    """Cached support map for this ECU's firmware, probing (and caching) if needed."""
+    sig = firmware_signature(sock, dest)
+    state = None if reprobe or sig == 'unknown' else load_support(dest, sig)
+    if state is None:
+        state = probe(sock, dest, repeats=repeats)
+        if sig != 'unknown':
+            save_support(dest, sig, state)
+    return state
+
+
+def live_hashes(state: dict, include_zero: bool = True) -> set:
+    """Hashes worth polling: answering ones, plus zero-valued ones unless excluded."""
+    keep = ('ok', 'zero') if include_zero else ('ok',)
+    return {h for h, s in state.items() if s in keep}
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Reader for variables.bin, the compact hash -> name table written by
+gen_variables.py next to variables.json.
+
+The file is mapped straight into arrays (no JSON parsing, no per-entry
+dicts); lookups by hash are a binary search over the sorted hash column.
+"""
+import sys
+import struct
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+
+from . import _ROOT
+
+MAGIC = b'EPVT'
+VERSION = 1
+_HEADER = struct.Struct('>4sHHI')
+SOURCES = ('output', 'config')
+
+
+class VariableTable:
+    def __init__(self, data: bytes):
+        magic, version, _, n = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'not a variables.bin v{VERSION} table')
+        off = _HEADER.size
+        self.hashes = array('i', data[off:off + 4 * n])
+        off += 4 * n
+        self.offsets = array('I', data[off:off + 4 * (n + 1)])
+        off += 4 * (n + 1)
+        if sys.byteorder == 'little':
+            self.hashes.byteswap()
+            self.offsets.byteswap()
+        self.sources = data[off:off + n]
+        self.names = data[off + n:]
+        if len(self.sources) != n or len(self.names) != self.offsets[-1]:
+            raise ValueError('truncated variables.bin')
+
+    @classmethod
+    def load(cls, path=None) -> 'VariableTable':
+        return cls(Path(path or _ROOT / 'variables.bin').read_bytes())
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def _index(self, h: int) -> int:
+        i = bisect_left(self.hashes, h)
+        return i if i < len(self.hashes) and self.hashes[i] == h else -1
+
+    def __contains__(self, h: int) -> bool:
+        return self._index(h) >= 0
+
+    def name_of(self, h: int) -> str | None:
+        i = self._index(h)
+        if i < 0:
+            return None
+        return self.names[self.offsets[i]:self.offsets[i + 1]].decode('utf-8')
+
+    def source_of(self, h: int) -> str | None:
+        i = self._index(h)
+        return None if i < 0 else SOURCES[self.sources[i]]
@@ -8,16 +8,21 @@ from pathlib import Path
 
 # Import EpicECU helper
 try:
-    from EpicECU import can_socket, get_variable
+    from EpicECU import can_socket, get_variable, djb2lowercase, probe
+    from EpicECU.history import History
+    from EpicECU.derived import DerivedChannels
 except Exception:
     # allow running from repo root
     sys.path.append(str(Path(__file__).resolve().parent))
-    from EpicECU import can_socket, get_variable
+    from EpicECU import can_socket, get_variable, djb2lowercase, probe
+    from EpicECU.history import History
+    from EpicECU.derived import DerivedChannels
 
 VAR_JSON_PATH = Path(__file__).resolve().parents[2] / 'variables.json'
 
 class AppState:
-    def __init__(self, iface: str, ecu: int, rate_hz: float):
+    def __init__(self, iface: str, ecu: int, rate_hz: float, history_len: int = 256, skip_dead: bool = False,
+                 derived: DerivedChannels | None = None):
         self.iface = iface
         self.ecu = ecu
         self.rate_hz = max(0.5, min(rate_hz, 50.0))
@@ -25,16 +30,25 @@ class AppState:
         self.filter_text = ''
         self.selected = []  # list of (name, hash, source)
         self.values = {}     # hash -> (value, ts)
+        # bounded per-variable history (watched variables only)
+        self.history_len = max(8, history_len)
+        self.history = {}    # hash -> History
+        self.history_levels = 3
+        self.history_factor = 8
+        self.history_level = 0  # 0 = raw samples, n = min/max of every factor**n samples
+        self.spark_cache = {}   # hash -> (version, width, level, text)
         self.error = ''
         self.focus = 'selector'  # selector | values | search
         self.selector_idx = 0
         self.values_idx = 0
         self.catalog = []   # list of dict {name, hash, source}
+        self.skip_dead = skip_dead  # hide variables this ECU's firmware never answers
+        self.derived = derived      # computed channels, listed with source 'derived'
         self.sock = None
         # pagination sizes (rows visible); updated by draw functions each frame
         self.selector_page_rows = 10
         self.values_page_rows = 10
-        # source filter: 'both' | 'config' | 'output'
+        # source filter: 'both' | 'config' | 'output' | 'derived'
         self.source_mode = 'both'
         # search edit state
         self.filter_cursor = 0  # insertion cursor within filter_text
@@ -69,12 +83,45 @@ class AppState:
         if item not in self.selected:
             self.selected.append(item)
 
+    def remove_selected(self, item):
+        if item in self.selected:
+            self.selected.remove(item)
+            self.drop_history(int(item['hash']))
+
     def remove_selected_at(self, idx: int):
         if 0 <= idx < len(self.selected):
-            self.selected.pop(idx)
+            self.drop_history(int(self.selected.pop(idx)['hash']))
 
     def clear_selected(self):
         self.selected.clear()
+        self.history.clear()
+        self.spark_cache.clear()
+
+    def record(self, h: int, v: float, ts: float):
+        self.values[h] = (v, ts)
+        hist = self.history.get(h)
+        if hist is None:
+            hist = self.history[h] = History(self.history_len, self.history_levels, self.history_factor)
+        hist.push(v)
+
+    def drop_history(self, h: int):
+        self.history.pop(h, None)
+        self.spark_cache.pop(h, None)
+
+    def cycle_history_level(self):
+        self.history_level = (self.history_level + 1) % self.history_levels
+
+    def sparkline(self, h: int, width: int) -> str:
+        hist = self.history.get(h)
+        if hist is None or width <= 0:
+            return ''
+        cached = self.spark_cache.get(h)
+        key = (hist.version, width, self.history_level)
+        if cached is not None and cached[:3] == key:
+            return cached[3]
+        text = hist.sparkline(width, self.history_level)
+        self.spark_cache[h] = key + (text,)
+        return text
 
 
 def load_variables(path: Path):
@@ -98,10 +145,10 @@ def draw_header(win, st: AppState, width):
     h, w = win.getmaxyx()
     width = min(width, w)
     poll_txt = 'ON' if st.polling else 'OFF'
-    msg = f'iface={st.iface}  ECU={st.ecu}  Poll={poll_txt}  Rate={st.rate_hz:.1f}Hz'
+    msg = f'iface={st.iface}  ECU={st.ecu}  Poll={poll_txt}  Rate={st.rate_hz:.1f}Hz  Trend=1:{st.history_factor ** st.history_level}'
     if st.error:
         msg += f'  ERROR: {st.error}'
-    help_txt = ' [p]oll  [+/-] rate  [e]cu  [Tab] focus  [Space] select  [f]ilter source  [q]uit'
+    help_txt = ' [p]oll  [+/-] rate  [e]cu  [Tab] focus  [Space] select  [f]ilter source  [h]istory zoom  [q]uit'
     try:
         win.addnstr(0, 0, msg.ljust(width), width, curses.color_pair(3) | curses.A_BOLD)
         if h > 1:
@@ -183,8 +230,11 @@ def draw_values(win, st: AppState, height, width):
     win.box()
     inner_w = max(1, width - 2)
     inner_h = max(1, height - 2)
+    # fixed columns: name(28) value(10) min/max/avg(9 each) age(4) + separators; sparkline gets the rest
+    spark_w = max(0, inner_w - 76)
+    title = f'{"Live values:":<28} {"value":>10} {"min":>9} {"max":>9} {"avg":>9} {"age":>4}  trend'
     try:
-        win.addnstr(1, 1, 'Live values:'.ljust(inner_w), inner_w, curses.color_pair(1) | curses.A_BOLD)
+        win.addnstr(1, 1, title.ljust(inner_w), inner_w, curses.color_pair(1) | curses.A_BOLD)
     except curses.error:
         pass
     page_rows = max(1, inner_h - 2)
@@ -205,7 +255,11 @@ def draw_values(win, st: AppState, height, width):
         v, ts = st.values.get(h, ('—', 0))
         age = f'{int(now - ts)}s' if ts else '—'
         val_txt = f'{v:.3f}' if isinstance(v, float) else str(v)
-        line = f'{it["name"]:<32} {val_txt:>12}  {age:>4}  hash={h}'
+        hist = st.history.get(h)
+        lo, hi, avg = hist.stats() if hist is not None else (None, None, None)
+        lo_txt, hi_txt, avg_txt = (f'{x:.2f}' if x is not None else '—' for x in (lo, hi, avg))
+        line = (f'{it["name"]:<28.28} {val_txt:>10} {lo_txt:>9} {hi_txt:>9} {avg_txt:>9} {age:>4}  '
+                f'{st.sparkline(h, spark_w)}')
         is_cursor = (st.focus == 'values' and i == st.values_idx)
         attr = curses.color_pair(2) | curses.A_BOLD if is_cursor else curses.color_pair(1)
         try:
@@ -318,11 +372,15 @@ def handle_key(stdscr, st: AppState, ch):
         st.toggle_polling()
         return True
     if ch in (ord('f'), ord('F')):
-        # Cycle source filter: both -> config -> output -> both
-        st.source_mode = 'config' if st.source_mode == 'both' else ('output' if st.source_mode == 'config' else 'both')
+        # Cycle source filter: both -> config -> output [-> derived] -> both
+        modes = ['both', 'config', 'output'] + (['derived'] if st.derived else [])
+        st.source_mode = modes[(modes.index(st.source_mode) + 1) % len(modes)]
         # Reset selector index to keep view sane
         st.selector_idx = 0
         return True
+    if ch in (ord('h'), ord('H')):
+        st.cycle_history_level()
+        return True
     if ch in (ord('+'), ord('=')):
         st.bump_rate(+0.5)
         return True
@@ -367,7 +425,7 @@ def handle_key(stdscr, st: AppState, ch):
             if 0 <= st.selector_idx < len(items):
                 it = items[st.selector_idx]
                 if it in st.selected:
-                    st.selected.remove(it)
+                    st.remove_selected(it)
                 else:
                     st.add_selected(it)
             return True
@@ -421,17 +479,37 @@ def handle_key(stdscr, st: AppState, ch):
     return True
 
 
+def derived_items(derived: DerivedChannels):
+    return [{'name': n, 'hash': djb2lowercase(n), 'source': 'derived'} for n in derived.order]
+
+
 def poll_once(st: AppState):
     if not st.selected or not st.sock:
         return
-    for it in st.selected:
-        h = int(it['hash'])
+    raw = [it for it in st.selected if it['source'] != 'derived']
+    computed = [it for it in st.selected if it['source'] == 'derived']
+    # inputs of the watched derived channels are read along with the raw selection
+    names = {it['name'] for it in raw}
+    if computed:
+        names |= st.derived.inputs_of(it['name'] for it in computed)
+    samples = {}
+    for name in names:
         try:
-            v = get_variable(st.sock, h, dest=st.ecu)
-            st.values[h] = (float(v), time.time())
+            v = get_variable(st.sock, djb2lowercase(name), dest=st.ecu)
+            samples[name] = float(v)
             st.clear_error()
         except Exception as e:
             st.set_error(str(e))
+    now = time.time()
+    for it in raw:
+        if it['name'] in samples:
+            st.record(int(it['hash']), samples[it['name']], now)
+    if computed:
+        st.derived.update(samples)
+        for it in computed:
+            v = st.derived.values.get(it['name'])
+            if v is not None:
+                st.record(int(it['hash']), v, now)
 
 
 def run(stdscr, st: AppState):
@@ -458,11 +536,22 @@ def run(stdscr, st: AppState):
     stdscr.timeout(50)
 
     st.catalog = load_variables(VAR_JSON_PATH)
+    if st.derived:
+        st.catalog += derived_items(st.derived)
     try:
         st.sock = can_socket(st.iface)
     except Exception as e:
         st.set_error(f'CAN open failed: {e}')
         st.sock = None
+    if st.skip_dead and st.sock:
+        # cached per firmware; the first run against a new firmware probes the whole catalog
+        try:
+            stdscr.addstr(0, 0, 'Probing variable availability...', curses.color_pair(1))
+            stdscr.refresh()
+            live = probe.live_hashes(probe.support_for(st.sock, st.ecu))
+            st.catalog = [it for it in st.catalog if it['hash'] in live or it['source'] == 'derived']
+        except Exception as e:
+            st.set_error(f'probe failed: {e}')
 
     last_poll = 0.0
     while True:
@@ -504,9 +593,18 @@ def main():
     ap.add_argument('--iface', default='can0', help='SocketCAN interface (default: can0)')
     ap.add_argument('--ecu', type=int, default=0, help='ECU address 0..15 (default: 0)')
     ap.add_argument('--rate', type=float, default=10.0, help='Poll rate in Hz (default: 10.0)')
+    ap.add_argument('--history', type=int, default=256, help='Samples kept per variable and trend level (default: 256)')
+    ap.add_argument('--skip-dead', action='store_true', help='Hide variables the ECU never answers (probed once per firmware, then cached)')
+    ap.add_argument('--derived', type=Path, help='JSON file of derived channels {name: expression}')
     args = ap.parse_args()
 
-    st = AppState(args.iface, args.ecu, args.rate)
+    derived = None
+    if args.derived:
+        try:
+            derived = DerivedChannels.from_file(args.derived)
+        except (OSError, ValueError) as e:
+            ap.error(f'--derived: {e}')
+    st = AppState(args.iface, args.ecu, args.rate, args.history, args.skip_dead, derived)
     curses.wrapper(run, st)
 
 if __name__ == '__main__':
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Proportional closed loop: read one variable, call a function with the correction.
+
+Example: hold MAP at 150 kPa by trimming boost duty at 500 Hz on CPU 3:
+  sudo python3 control_loop.py 0 MAPSensor 150 0.2 setBoostDutyAdd --rate 500 --fifo 80 --cpu 3
+"""
+import sys
+import argparse
+from pathlib import Path
+
+try:
+    from EpicECU import can_socket, djb2lowercase
+    from EpicECU.control import ControlLoop, realtime
+except Exception:
+    sys.path.append(str(Path(__file__).resolve().parent))
+    from EpicECU import can_socket, djb2lowercase
+    from EpicECU.control import ControlLoop, realtime
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Fixed-rate P controller over EPIC CANbus')
+    ap.add_argument('ecu', type=lambda s: int(s, 0), help='ECU address 0..15')
+    ap.add_argument('var', help='Input variable name or hash')
+    ap.add_argument('target', type=float, help='Setpoint for the input variable')
+    ap.add_argument('kp', type=float, help='Proportional gain (output per unit of error)')
+    ap.add_argument('func', help='Function id or name from functions_v1.json (e.g. setBoostDutyAdd)')
+    ap.add_argument('--bias', type=float, default=0.0, help='Output offset added to kp * error (default: 0)')
+    ap.add_argument('--min', dest='out_min', type=float, default=float('-inf'), help='Output lower clamp')
+    ap.add_argument('--max', dest='out_max', type=float, default=float('inf'), help='Output upper clamp')
+    ap.add_argument('--rate', type=float, default=500.0, help='Loop rate in Hz (default: 500)')
+    ap.add_argument('--max-stale', type=int, default=5,
+                    help='Stop calling after this many cycles in a row without a reply (default: 5)')
+    ap.add_argument('--duration', type=float, default=None, help='Stop after N seconds (default: run until Ctrl-C)')
+    ap.add_argument('--fifo', type=int, default=None, help='SCHED_FIFO priority 1..99 (needs root)')
+    ap.add_argument('--cpu', type=int, action='append', default=None, help='Pin to CPU (repeatable)')
+    ap.add_argument('--iface', default='can0', help='SocketCAN interface (default: can0)')
+    args = ap.parse_args()
+
+    try:
+        h = int(args.var, 0)
+    except ValueError:
+        h = djb2lowercase(args.var)
+    target, kp, bias, lo, hi = args.target, args.kp, args.bias, args.out_min, args.out_max
+
+    def compute(inputs, got):
+        out = bias + kp * (target - inputs[0])
+        return lo if out < lo else (hi if out > hi else out)
+
+    loop = ControlLoop(can_socket(args.iface), [h], compute, args.func, dest=args.ecu, period_s=1.0 / args.rate,
+                       max_stale=args.max_stale)
+    with realtime(priority=args.fifo, cpus=args.cpu) as rt:
+        for w in rt.warnings:
+            print(f'warning: {w}')
+        try:
+            loop.run(duration_s=args.duration)
+        except KeyboardInterrupt:
+            pass
+    r = loop.report()
+    print(f"cycles={r['cycles']} overruns={r['overruns']} stale_reads={r['stale_reads']} "
+          f"skipped_calls={r['skipped_calls']} "
+          f"jitter mean={r['mean_jitter_us']:.1f}us max={r['max_jitter_us']:.1f}us")
+    for lo_us, count in r['jitter_hist_us']:
+        print(f'  >={lo_us:>5} us  {count}')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Local EPIC ECU stand-in for testing tools without hardware.
+
+Answers on a (v)can interface like an ECU at one address:
+- v1 get_variable (0x700 -> 0x720), set_variable (0x780), call_function (0x740 -> 0x760)
+- v2 packed groups (0x7A0 -> 0x7C0), the reference implementation of the
+  extension described in Docs/packet_basics.md
+
+Catalog variables report a synthetic value (outputs drift slowly over time);
+unknown hashes answer 0.0 like the firmware, or stay silent with --silent-unknown.
+
+  sudo ip link add dev vcan0 type vcan && sudo ip link set vcan0 mtu 72 up
+  python3 ecu_sim.py --iface vcan0 --ecu 0 --fd
+"""
+import sys
+import math
+import time
+import struct
+import argparse
+from pathlib import Path
+
+try:
+    from EpicECU import can_socket, send_frame, send_fd_frame, recv_frame, load_variables
+    from EpicECU import packed
+except Exception:
+    sys.path.append(str(Path(__file__).resolve().parent))
+    from EpicECU import can_socket, send_frame, send_fd_frame, recv_frame, load_variables
+    from EpicECU import packed
+
+MAX_GROUPS = 16
+MAX_SLOTS = 255
+
+
+class EcuSimulator:
+    def __init__(self, ecu: int = 0, fd: bool = False, silent_unknown: bool = False, v2: bool = True):
+        self.ecu = ecu & 0x0F
+        self.fd = fd
+        self.v2 = v2
+        self.silent_unknown = silent_unknown
+        self.t0 = time.monotonic()
+        self.store = {}   # hash -> value written via set_variable
+        self.outputs = set()
+        self.known = set()
+        for it in load_variables():
+            h = int(it['hash'])
+            self.known.add(h)
+            if it.get('source') == 'output':
+                self.outputs.add(h)
+        self.groups = {}  # gid -> [(hash, fmt)]
+
+    def value(self, h: int) -> float | None:
+        if h in self.store:
+            return self.store[h]
+        if h not in self.known:
+            return None if self.silent_unknown else 0.0
+        base = (abs(h) % 10000) / 100.0
+        if h in self.outputs:
+            return base + math.sin((time.monotonic() - self.t0) + (h & 7))
+        return base
+
+    def handle(self, can_id: int, data: bytes) -> list:
+        """Process one received frame; returns [(can_id, payload, is_fd)] to send."""
+        base, ecu = can_id & 0x7F0, can_id & 0x0F
+        if ecu != self.ecu or len(data) < 1:
+            return []
+        if base == 0x700 and len(data) >= 4:
+            h = struct.unpack('>i', data[0:4])[0]
+            v = self.value(h)
+            return [] if v is None else [(0x720 + ecu, struct.pack('>if', h, v), False)]
+        if base == 0x780 and len(data) >= 8:
+            h, v = struct.unpack('>if', data[0:8])
+            self.store[h] = v
+            return []
+        if base == 0x740 and len(data) >= 2:
+            return [(0x760 + ecu, data[0:2] + bytes(2) + struct.pack('>f', 0.0), False)]
+        if base == packed.REQ_BASE and self.v2:
+            return self._handle_v2(ecu, data)
+        return []
+
+    def _handle_v2(self, ecu: int, data: bytes) -> list:
+        rsp = packed.RSP_BASE + ecu
+        op = data[0]
+        if op == packed.OP_HELLO:
+            flags = packed.FLAG_FD if self.fd else 0
+            return [(rsp, bytes([packed.OP_HELLO, packed.VERSION, flags, MAX_GROUPS, MAX_SLOTS]), False)]
+        if op == packed.OP_DEFINE and len(data) >= 8:
+            gid, slot, fmt = data[1], data[2], data[3]
+            h = struct.unpack('>i', data[4:8])[0]
+            status = packed.STATUS_OK
+            if gid >= MAX_GROUPS:
+                status = packed.STATUS_BAD_GROUP
+            elif (fmt >> 4) not in packed._SIZE:
+                status = packed.STATUS_BAD_FORMAT
+            else:
+                slots = [] if slot == 0 else self.groups.get(gid, [])
+                if slot != len(slots):
+                    status = packed.STATUS_BAD_SLOT
+                else:
+                    try:
+                        # groups larger than the classic layout allows can only be read over FD
+                        packed.layout([f for _, f in slots] + [fmt], fd=self.fd)
+                    except ValueError:
+                        status = packed.STATUS_BAD_SLOT
+                    else:
+                        self.groups[gid] = slots + [(h, fmt)]
+            return [(rsp, bytes([packed.OP_DEFINE, gid, slot, status]), False)]
+        if op == packed.OP_READ and len(data) >= 4:
+            gid, seq, flags = data[1], data[2], data[3]
+            slots = self.groups.get(gid)
+            if not slots:
+                return []
+            fd = bool(flags & packed.FLAG_FD) and self.fd
+            fmts = [f for _, f in slots]
+            values = [self.value(h) or 0.0 for h, _ in slots]
+            try:
+                frames = packed.encode_frames(fmts, values, fd=fd)
+            except ValueError:
+                return []  # FD-sized group requested over classic CAN
+            return [(rsp, packed.data_header(seq, i, gid) + payload, fd) for i, payload in enumerate(frames)]
+        return []
+
+
+def main():
+    ap = argparse.ArgumentParser(description='EPIC ECU simulator for (v)can testing')
+    ap.add_argument('--iface', default='vcan0', help='SocketCAN interface (default: vcan0)')
+    ap.add_argument('--ecu', type=int, default=0, help='ECU address 0..15 (default: 0)')
+    ap.add_argument('--fd', action='store_true', help='Enable CAN FD replies for v2 groups (interface mtu 72)')
+    ap.add_argument('--v1-only', action='store_true', help='Do not answer v2 requests (tests client fallback)')
+    ap.add_argument('--silent-unknown', action='store_true', help='Ignore unknown hashes instead of answering 0.0')
+    args = ap.parse_args()
+
+    sim = EcuSimulator(args.ecu, fd=args.fd, silent_unknown=args.silent_unknown, v2=not args.v1_only)
+    s = can_socket(args.iface, fd=args.fd)
+    print(f'simulating ECU {sim.ecu} on {args.iface} ({len(sim.known)} catalog variables, '
+          f'v2={"off" if args.v1_only else "on"}, fd={"on" if args.fd else "off"}); Ctrl-C to stop')
+    try:
+        while True:
+            rx_id, dlc, payload = recv_frame(s)
+            for tx_id, data, is_fd in sim.handle(rx_id, payload[:dlc]):
+                (send_fd_frame if is_fd else send_frame)(s, tx_id, data)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
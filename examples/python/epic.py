@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Unified EPIC Over CANbus command line.
+
+usage: epic.py [--iface IFACE] <command> [args...]
+
+Subcommand modules are imported only when their command runs, so a plain
+`epic.py get` pays for nothing else. Use `batch` to push many commands
+through one process and one socket.
+"""
+import sys
+import os
+
+# command -> (module, function, usage)
+COMMANDS = {
+    'get': ('EpicECU.cli', 'cmd_get', 'get <ecu> <var_name | hash> [more vars...]'),
+    'set': ('EpicECU.cli', 'cmd_set', 'set <ecu> <var_name> <value>'),
+    'call': ('EpicECU.cli', 'cmd_call', 'call <ecu> <func_id | name> [arg_f32] [arg2_i16]'),
+    'batch': ('EpicECU.cli', 'cmd_batch', 'batch [file | -]   # one get/set/call per line, text or JSON'),
+    'dump': ('EpicECU.cli', 'cmd_dump', 'dump <ecu> <file.json[.gz]>   # snapshot all config variables'),
+    'restore': ('EpicECU.cli', 'cmd_restore', 'restore <ecu> <file.json[.gz]> [--rate WRITES_PER_S] [--dry-run]'),
+    'probe': ('EpicECU.cli', 'cmd_probe', 'probe <ecu> [--repeats N] [--force] [--list]   # which variables answer'),
+    'poll': ('EpicECU.cli', 'cmd_poll', 'poll IFACE:ECU:var1,var2 [IFACE:ECU:...] [--rate HZ] [--duration S] [--skip-dead] [--derived FILE]   # CSV to stdout'),
+    'alarms': ('EpicECU.cli', 'cmd_alarms', 'alarms [IFACE:]<ecu> <rules.json> [--rate HZ] [--duration S] [--derived FILE]   # limit checks'),
+}
+
+
+def usage() -> int:
+    print('usage: epic.py [--iface IFACE] <command> [args...]   (iface also via EPIC_IFACE, default can0)')
+    for name, (_, _, text) in COMMANDS.items():
+        print(f'  {text}')
+    return 1
+
+
+def main(argv=None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    iface = os.environ.get('EPIC_IFACE', 'can0')
+    if len(argv) >= 2 and argv[0] == '--iface':
+        iface = argv[1]
+        argv = argv[2:]
+    if not argv or argv[0] not in COMMANDS:
+        return usage()
+    module, func, _ = COMMANDS[argv[0]]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import importlib
+    return getattr(importlib.import_module(module), func)(iface, argv[1:])
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
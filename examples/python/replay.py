@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""Replay a recorded EPIC session onto a (v)can interface.
+
+Inputs:
+- candump log files (`candump -l` / `candump -L`): `(1697040000.123456) can0 720#FF1A2B3C41200000`
+- sample logs (CSV with header containing ts, ecu, hash, value), replayed as
+  0x720 + ecu get_variable responses
+
+Timing: original inter-frame spacing divided by --speed; --speed 0 sends as
+fast as possible. Frames are pre-packed up front, every frame that is due is
+sent back to back, and the scheduler sleeps coarsely then spins on
+perf_counter for the last stretch so timing error stays in the microseconds.
+A burst is still one send() per frame: raw CAN sockets take one frame per
+write and Python has no sendmmsg().
+
+RTR frames (`700#R`, `700#R4`) are replayed as remote requests; 8-digit IDs
+are sent as extended (29-bit) frames.
+"""
+import sys
+import time
+import errno
+import socket
+import struct
+import argparse
+from pathlib import Path
+
+try:
+    from EpicECU import can_socket, _FMT
+except Exception:
+    sys.path.append(str(Path(__file__).resolve().parent))
+    from EpicECU import can_socket, _FMT
+
+SPIN_S = 0.0005  # busy-wait the last 0.5 ms before a deadline
+
+
+def parse_candump(lines):
+    for line in lines:
+        line = line.strip()
+        if not line.startswith('('):
+            continue
+        try:
+            ts_txt, _, frame = line.split(None, 2)
+            can_txt, data_txt = frame.split()[0].split('#', 1)
+        except ValueError:
+            continue
+        if data_txt.startswith('#'):
+            continue  # CAN FD frames are not replayed on classic sockets
+        try:
+            can_id = int(can_txt, 16)
+            if data_txt[:1] in ('R', 'r'):
+                # remote request: no payload, only a length; zero bytes stand in for it
+                can_id |= socket.CAN_RTR_FLAG
+                data = bytes(int(data_txt[1:] or 0))
+            else:
+                data = bytes.fromhex(data_txt)
+            ts = float(ts_txt.strip('()'))
+        except ValueError:
+            continue
+        if len(data) > 8:
+            continue
+        if len(can_txt) == 8:
+            can_id |= socket.CAN_EFF_FLAG
+        yield ts, can_id, data
+
+
+def parse_samples(lines):
+    header = None
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        cols = line.split(',')
+        if header is None:
+            header = {c.strip(): i for i, c in enumerate(cols)}
+            missing = [c for c in ('ts', 'hash', 'value') if c not in header]
+            if missing:
+                raise ValueError(f'sample log header lacks column(s) {", ".join(missing)}: {line}')
+            continue
+        try:
+            ts = float(cols[header['ts']])
+            ecu = int(cols[header['ecu']], 0) if 'ecu' in header else 0
+            h = int(cols[header['hash']], 0)
+            v = float(cols[header['value']])
+            data = struct.pack('>if', h, v)
+        except (ValueError, IndexError, OverflowError, struct.error):
+            continue  # truncated row or non-numeric field
+        yield ts, 0x720 + (ecu & 0x0F), data
+
+
+def load_frames(path: Path):
+    """Return (timestamps, packed_frames) sorted by timestamp."""
+    with path.open('r', encoding='utf-8', errors='ignore') as f:
+        first = f.readline()
+        f.seek(0)
+        parser = parse_candump if first.lstrip().startswith('(') else parse_samples
+        rows = sorted(parser(f), key=lambda r: r[0])
+    times = [r[0] for r in rows]
+    frames = [struct.pack(_FMT, can_id, len(data), data + bytes(8 - len(data))) for _, can_id, data in rows]
+    return times, frames
+
+
+def send_blocking(sock, frame) -> int:
+    """Send one frame, backing off while the tx queue is full. Returns retry count."""
+    retries = 0
+    while True:
+        try:
+            sock.send(frame)
+            return retries
+        except OSError as e:
+            if e.errno != errno.ENOBUFS:
+                raise
+            retries += 1
+            time.sleep(0)
+
+
+def replay(sock, times, frames, speed: float = 1.0, loops: int = 1) -> dict:
+    n = len(frames)
+    if n == 0:
+        return {'frames': 0}
+    span = times[-1] - times[0]
+    scale = 0.0 if speed <= 0 else 1.0 / speed
+    # offsets relative to the first frame, already scaled
+    offsets = [(t - times[0]) * scale for t in times]
+    loop_len = span * scale
+    sent = 0
+    enobufs = 0
+    err_sum = 0.0
+    err_max = 0.0
+    perf = time.perf_counter
+    t_start = perf()
+    for loop in range(loops):
+        base = t_start + loop * loop_len
+        i = 0
+        while i < n:
+            target = base + offsets[i]
+            now = perf()
+            if now < target:
+                if target - now > SPIN_S:
+                    time.sleep(target - now - SPIN_S)
+                while perf() < target:
+                    pass
+                now = perf()
+            # burst every frame that is already due
+            while i < n and base + offsets[i] <= now:
+                enobufs += send_blocking(sock, frames[i])
+                late = perf() - (base + offsets[i])
+                err_sum += late
+                if late > err_max:
+                    err_max = late
+                i += 1
+                sent += 1
+    elapsed = perf() - t_start
+    return {
+        'frames': sent,
+        'elapsed_s': elapsed,
+        'fps': sent / elapsed if elapsed > 0 else float('inf'),
+        'recorded_fps': (n / span) if span > 0 else float('inf'),
+        'mean_late_us': err_sum / sent * 1e6 if scale else None,
+        'max_late_us': err_max * 1e6 if scale else None,
+        'enobufs_retries': enobufs,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Replay a recorded EPIC CAN session onto a (v)can interface')
+    ap.add_argument('log', type=Path, help='candump log or CSV sample log (ts,ecu,hash,value)')
+    ap.add_argument('--iface', default='vcan0', help='SocketCAN interface (default: vcan0)')
+    ap.add_argument('--speed', type=float, default=1.0, help='Playback speed multiplier; 0 = as fast as possible (default: 1.0)')
+    ap.add_argument('--loop', type=int, default=1, help='Number of passes over the log (default: 1)')
+    args = ap.parse_args()
+
+    try:
+        times, frames = load_frames(args.log)
+    except (OSError, ValueError) as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 1
+    if not frames:
+        print(f'no frames in {args.log}')
+        return 1
+    s = can_socket(args.iface)
+    stats = replay(s, times, frames, speed=args.speed, loops=max(1, args.loop))
+    print(f"sent {stats['frames']} frames in {stats['elapsed_s']:.3f}s: {stats['fps']:.0f} fps "
+          f"(recorded {stats['recorded_fps']:.0f} fps)")
+    if stats['mean_late_us'] is not None:
+        print(f"timing error: mean {stats['mean_late_us']:.1f} us, max {stats['max_late_us']:.1f} us")
+    if stats['enobufs_retries']:
+        print(f"tx queue full {stats['enobufs_retries']} times (raise txqueuelen: ip link set {args.iface} txqueuelen 1000)")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
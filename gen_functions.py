@@ -1,18 +1,25 @@
 #!/usr/bin/env python3
 import re
+import sys
 import json
+import hashlib
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[1]
 SRC = ROOT / 'firmware' / 'controllers' / 'can' / 'epic_can.cpp'
 OUT = ROOT / 'epic_can_bus' / 'functions_v1.json'
+STAMP = OUT.with_name('.functions_v1.stamp')
 
-def parse_functions_from_cpp(text: str):
+# Matches lines like: { 35, "setDacVoltage", 1, false, fn_setDacVoltage },
+RX = re.compile(r"\{\s*(?P<id>\d+)\s*,\s*\"(?P<name>[^\"]+)\"\s*,\s*(?P<argc>\d+)\s*,\s*(?P<ret>true|false)\s*,")
+
+def parse_functions_from_cpp(lines):
     entries = []
-    # Matches lines like: { 35, "setDacVoltage", 1, false, fn_setDacVoltage },
-    rx = re.compile(r"\{\s*(?P<id>\d+)\s*,\s*\"(?P<name>[^\"]+)\"\s*,\s*(?P<argc>\d+)\s*,\s*(?P<ret>true|false)\s*,")
-    for line in text.splitlines():
-        m = rx.search(line)
+    for line in lines:
+        # cheap pre-filter: registry rows contain both a brace and a quoted name
+        if '{' not in line or '"' not in line:
+            continue
+        m = RX.search(line)
         if not m:
             continue
         func_id = int(m.group('id'))
@@ -34,11 +41,27 @@ def parse_functions_from_cpp(text: str):
 def main():
     if not SRC.exists():
         raise SystemExit(f'source not found: {SRC}')
-    text = SRC.read_text(encoding='utf-8', errors='ignore')
-    funcs = parse_functions_from_cpp(text)
-    OUT.write_text(json.dumps(funcs, indent=2), encoding='utf-8')
+    raw = SRC.read_bytes()
+    digest = hashlib.sha256(raw + b'\0' + Path(__file__).read_bytes()).hexdigest()
+    if '--force' not in sys.argv[1:] and OUT.exists() and STAMP.exists() and STAMP.read_text().strip() == digest:
+        print(f'{OUT.name}: source unchanged, skipping')
+        return 0
+    funcs = parse_functions_from_cpp(raw.decode('utf-8', errors='ignore').splitlines())
+    status = 0
+    for key in ('id', 'luaName'):
+        seen = {}
+        for f in funcs:
+            if f[key] in seen:
+                print(f'error: duplicate function {key} {f[key]!r}: {seen[f[key]]["luaName"]}, {f["luaName"]}',
+                      file=sys.stderr)
+                status = 1
+            seen[f[key]] = f
+    text = json.dumps(funcs, indent=2)
+    if not OUT.exists() or OUT.read_text(encoding='utf-8') != text:
+        OUT.write_text(text, encoding='utf-8')
+    if status == 0:
+        STAMP.write_text(digest + '\n')
+    return status
 
 if __name__ == '__main__':
-    main()
-
-
+    raise SystemExit(main())
@@ -1,47 +1,143 @@
 #!/usr/bin/env python3
 import re
+import sys
 import json
+import struct
+import hashlib
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[1]
 OUT = ROOT / 'epic_can_bus' / 'variables.json'
+OUT_MIN = OUT.with_name('variables.min.json')
+OUT_BIN = OUT.with_name('variables.bin')
+STAMP = OUT.with_name('.variables.stamp')
 
 SRC_OUTPUT = ROOT / 'firmware' / 'controllers' / 'lua' / 'generated' / 'output_lookup_generated.cpp'
 SRC_CONFIG = ROOT / 'firmware' / 'controllers' / 'lua' / 'generated' / 'value_lookup_generated.cpp'
 
-def parse_hash_map(path: Path):
-    entries = []
-    if not path.exists():
-        return entries
+# variables.bin: header, then count int32 hashes (sorted), count+1 uint32 name
+# offsets into the name blob, count source bytes, and the UTF-8 name blob.
+# Big-endian like the wire protocol.
+BIN_MAGIC = b'EPVT'
+BIN_VERSION = 1
+BIN_HEADER = struct.Struct('>4sHHI')  # magic, version, reserved, count
+SOURCES = ('output', 'config')
+
+def djb2lowercase(name: str) -> int:
+    # same as EpicECU.djb2lowercase; the generator runs without the examples on sys.path
+    h = 5381
+    for ch in name:
+        h = ((h << 5) + h + ord(ch.lower())) & 0xFFFFFFFF
+    return h - (1 << 32) if h & 0x80000000 else h
+
+def parse_hash_map(text: str):
+    """Yield (name, hash) pairs from the text of a generated lookup file in one pass."""
     rx = re.compile(r'^\s*//\s*(?P<name>[A-Za-z0-9_\.]+)\s*$')
     rx_case = re.compile(r'^\s*case\s+(?P<hash>-?\d+)\s*:\s*$')
     current_name = None
-    for line in path.read_text(encoding='utf-8', errors='ignore').splitlines():
+    for line in text.splitlines():
         m = rx.match(line)
         if m:
             current_name = m.group('name')
             continue
         c = rx_case.match(line)
         if c and current_name:
-            entries.append((current_name, int(c.group('hash'))))
+            yield current_name, int(c.group('hash'))
             current_name = None
-    return entries
+
+def read_sources() -> dict:
+    """{path: bytes or None}; each source is read once and both hashed and parsed from memory."""
+    return {path: path.read_bytes() if path.exists() else None for path in (SRC_OUTPUT, SRC_CONFIG)}
+
+def source_digest(sources: dict) -> str:
+    """Content hash of both sources and this generator."""
+    d = hashlib.sha256()
+    for path, raw in list(sources.items()) + [(Path(__file__), Path(__file__).read_bytes())]:
+        d.update(path.name.encode() + b'\0')
+        d.update(b'<missing>' if raw is None else raw)
+        d.update(b'\0')
+    return d.hexdigest()
+
+def find_collisions(data):
+    """[(hash, [names])] for distinct names that share a djb2lowerCase hash."""
+    by_hash = {}
+    for it in data:
+        names = by_hash.setdefault(it['hash'], [])
+        if it['name'] not in names:
+            names.append(it['name'])
+    return [(h, names) for h, names in sorted(by_hash.items()) if len(names) > 1]
+
+def encode_table(data) -> bytes:
+    rows = sorted((it['hash'], it['name'].encode('utf-8'), SOURCES.index(it['source'])) for it in data)
+    offsets = [0]
+    for _, name, _ in rows:
+        offsets.append(offsets[-1] + len(name))
+    n = len(rows)
+    return b''.join((
+        BIN_HEADER.pack(BIN_MAGIC, BIN_VERSION, 0, n),
+        struct.pack(f'>{n}i', *(h for h, _, _ in rows)),
+        struct.pack(f'>{n + 1}I', *offsets),
+        bytes(s for _, _, s in rows),
+        b''.join(name for _, name, _ in rows),
+    ))
+
+def write_if_changed(path: Path, content: bytes) -> bool:
+    if path.exists() and path.read_bytes() == content:
+        return False
+    path.write_bytes(content)
+    return True
+
+def write_artifacts(data) -> list:
+    """Write variables.json (unchanged format), variables.min.json and variables.bin; returns written paths."""
+    OUT.parent.mkdir(parents=True, exist_ok=True)
+    outputs = (
+        (OUT, json.dumps(data, indent=2).encode('utf-8')),
+        (OUT_MIN, json.dumps(data, separators=(',', ':')).encode('utf-8')),
+        (OUT_BIN, encode_table(data)),
+    )
+    return [path for path, content in outputs if write_if_changed(path, content)]
 
 def main():
-    entries = []
-    entries += parse_hash_map(SRC_OUTPUT)
-    entries += parse_hash_map(SRC_CONFIG)
+    force = '--force' in sys.argv[1:]
+    sources = read_sources()
+    digest = source_digest(sources)
+    outputs_exist = all(p.exists() for p in (OUT, OUT_MIN, OUT_BIN))
+    if not force and outputs_exist and STAMP.exists() and STAMP.read_text().strip() == digest:
+        print(f'{OUT.name}: sources unchanged, skipping')
+        return 0
+
+    # one pass over each source; output names are collected on the way
+    text = {path: '' if raw is None else raw.decode('utf-8', errors='ignore') for path, raw in sources.items()}
+    entries = set()
+    output_names = set()
+    for name, h in parse_hash_map(text[SRC_OUTPUT]):
+        entries.add((name, h))
+        output_names.add(name)
+    for name, h in parse_hash_map(text[SRC_CONFIG]):
+        entries.add((name, h))
 
-    # Build JSON list
-    output_names = {n for (n, _) in parse_hash_map(SRC_OUTPUT)}
     data = []
-    for name, h in sorted(set(entries), key=lambda x: (x[0].lower(), x[1])):
+    for name, h in sorted(entries, key=lambda x: (x[0].lower(), x[1])):
         source = 'output' if name in output_names else 'config'
         data.append({"name": name, "hash": h, "source": source})
-    OUT.parent.mkdir(parents=True, exist_ok=True)
-    OUT.write_text(json.dumps(data, indent=2), encoding='utf-8')
 
-if __name__ == '__main__':
-    main()
+    status = 0
+    collisions = find_collisions(data)
+    for h, names in collisions:
+        print(f'error: hash collision {h}: {", ".join(names)}', file=sys.stderr)
+        status = 1
+    for it in data:
+        if djb2lowercase(it['name']) != it['hash']:
+            print(f'warning: {it["name"]}: firmware hash {it["hash"]} != djb2lowerCase {djb2lowercase(it["name"])}',
+                  file=sys.stderr)
 
+    written = write_artifacts(data)
+    print(f'{OUT.name}: {len(data)} variables, updated {", ".join(p.name for p in written) or "nothing"}')
+    if status == 0:
+        STAMP.write_text(digest + '\n')
+    elif STAMP.exists():
+        STAMP.unlink()  # collisions must be reported again on the next run
+    return status
 
+if __name__ == '__main__':
+    raise SystemExit(main())